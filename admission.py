@@ -0,0 +1,253 @@
+"""
+Contrôle d'admission : protège le petit pool de db.py contre les rafales.
+
+- routes lourdes (analytique) : limite de concurrence par route + plafond
+  global, avec une courte file d'attente. Le reste du pool reste donc
+  disponible pour les écritures et les lectures ponctuelles (comptoir),
+  qui ne passent jamais par ces files.
+- par client : deux seaux à jetons séparés. Les requêtes lourdes coûtent
+  selon la route (ex: /movements coûte plus cher avec limit=20000) ; les
+  écritures / lectures ponctuelles ont leur propre seau, plus large, pour
+  qu'un tableau de bord sur la même IP ne bloque pas le comptoir.
+- refus => 429 + Retry-After. Compteurs exposés via /metrics.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+
+# Plafond global des requêtes lourdes simultanées (< pool_size par défaut de 5)
+HEAVY_MAX_CONCURRENCY = int(os.getenv("HEAVY_MAX_CONCURRENCY", "3"))
+HEAVY_MAX_QUEUE = int(os.getenv("HEAVY_MAX_QUEUE", "10"))
+HEAVY_QUEUE_TIMEOUT = float(os.getenv("HEAVY_QUEUE_TIMEOUT", "2"))  # secondes
+
+# Seau à jetons par client, requêtes lourdes
+CLIENT_RATE = float(os.getenv("CLIENT_RATE", "10"))    # jetons / seconde
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "40"))  # capacité
+# Seau séparé pour les écritures / lectures ponctuelles (1 jeton par requête)
+LIGHT_RATE = float(os.getenv("LIGHT_RATE", "50"))
+LIGHT_BURST = float(os.getenv("LIGHT_BURST", "200"))
+MAX_CLIENTS = 10_000  # au-delà : on oublie les clients les moins récents
+
+# Nb de proxys de confiance devant l'app. Chacun ajoute une adresse à la
+# fin de X-Forwarded-For ; le début est fourni par le client et ne sert
+# donc jamais d'identité. 0 (défaut) = adresse de la connexion, header
+# ignoré. Sur Render : TRUSTED_PROXIES=1 dans les variables du service.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+
+# Routes lourdes (GET) : (concurrence max de la route, coût en jetons)
+HEAVY_ROUTES: Dict[str, Tuple[int, float]] = {
+    "/api/dashboard/movements": (2, 2),
+    "/api/dashboard/movements/filters": (2, 1),
+    "/api/dashboard/tableau_mensuel": (2, 5),
+    "/api/dashboard/list_products": (2, 5),
+    "/api/dashboard/kpis": (2, 3),
+    "/api/dashboard/movement_hist": (2, 2),
+    "/api/dashboard/etat_stock_share": (2, 2),
+    "/api/products/edit_products": (2, 2),
+}
+
+# Jamais filtrées
+EXEMPT = {"/healthz", "/metrics"}
+
+
+def _cost(path: str, query_string: bytes, base: float) -> float:
+    """Coût d'une requête lourde, pondéré par la taille demandée."""
+    if path == "/api/dashboard/movements":
+        qs = parse_qs(query_string.decode("latin-1"))
+        try:
+            limit = int(qs.get("limit", ["5000"])[0])
+        except ValueError:
+            limit = 5000
+        return base + limit / 2000
+    return base
+
+
+# ---------- Files par route ----------
+
+class Gate:
+    """Sémaphore avec file bornée et compteurs."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self) -> bool:
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._sem.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+# ---------- Seaux à jetons ----------
+
+class TokenBuckets:
+    """Un seau par client ; renvoie le délai d'attente si refus."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def take(self, client: str, cost: float) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - ts) * self.rate)
+            ok = tokens >= cost
+            self._buckets[client] = (tokens - cost if ok else tokens, now)
+            self._buckets.move_to_end(client)
+            # éviction LRU : un client qui change d'adresse ne remet pas
+            # à zéro les seaux des autres
+            while len(self._buckets) > MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+            if ok:
+                return None
+            self.rejected += 1
+            # coût > capacité : on attend que le seau soit plein
+            return (min(cost, self.burst) - tokens) / self.rate
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "rejected": self.rejected,
+        }
+
+
+# ---------- Middleware ASGI ----------
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.heavy = Gate("heavy", HEAVY_MAX_CONCURRENCY, HEAVY_MAX_QUEUE, HEAVY_QUEUE_TIMEOUT)
+        self.routes = {
+            path: Gate(path, limit, HEAVY_MAX_QUEUE, HEAVY_QUEUE_TIMEOUT)
+            for path, (limit, _) in HEAVY_ROUTES.items()
+        }
+        self.buckets = TokenBuckets(CLIENT_RATE, CLIENT_BURST)
+        self.light_buckets = TokenBuckets(LIGHT_RATE, LIGHT_BURST)
+        global _current
+        _current = self
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not ADMISSION_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in EXEMPT
+        ):
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        heavy = scope["method"] == "GET" and path in HEAVY_ROUTES
+        if heavy:
+            cost = _cost(path, scope.get("query_string", b""), HEAVY_ROUTES[path][1])
+            wait = self.buckets.take(_client_id(scope), cost)
+        else:
+            wait = self.light_buckets.take(_client_id(scope), 1)
+        if wait is not None:
+            return await _reject(send, wait, "Trop de requêtes, réessayez plus tard")
+
+        if not heavy:
+            return await self.app(scope, receive, send)
+
+        gate = self.routes[path]
+        if not await gate.acquire():
+            return await _reject(send, 1, "Serveur occupé, réessayez plus tard")
+        try:
+            if not await self.heavy.acquire():
+                return await _reject(send, 1, "Serveur occupé, réessayez plus tard")
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.heavy.release()
+        finally:
+            gate.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "heavy": self.heavy.snapshot(),
+            "routes": {path: g.snapshot() for path, g in self.routes.items()},
+            "clients": self.buckets.snapshot(),
+            "clients_light": self.light_buckets.snapshot(),
+        }
+
+
+_current: Optional[AdmissionMiddleware] = None
+
+
+def metrics() -> dict:
+    """Compteurs courants (vide tant que l'app n'a pas servi de requête)."""
+    if _current is None:
+        return {"enabled": ADMISSION_ENABLED}
+    return {"enabled": ADMISSION_ENABLED, **_current.snapshot()}
+
+
+def _client_id(scope) -> str:
+    # adresse ajoutée par le plus externe de nos proxys de confiance
+    client = scope.get("client")
+    peer = client[0] if client else "?"
+    if TRUSTED_PROXIES <= 0:
+        return peer
+    hops = []
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            hops += [h.strip() for h in value.decode("latin-1").split(",") if h.strip()]
+    if len(hops) < TRUSTED_PROXIES:
+        return peer
+    return hops[-TRUSTED_PROXIES]
+
+
+async def _reject(send, retry_after: float, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,306 @@
+"""
+Mode analytique en mémoire pour /kpis et /tableau_mensuel.
+
+Un mois (mouvements + états de stock + produits) est chargé une fois en
+colonnes NumPy ; les agrégats sont calculés par group-by vectorisés
+(bincount / lexsort). Changer de classe = un masque en mémoire, plus de
+nouvelle requête SQL.
+
+Activation : ANALYTICS_MODE=memory. numpy est une dépendance optionnelle
+(requirements-analytics.txt) ; s'il manque, on reste en SQL avec un
+avertissement dans les logs.
+Les résultats sont identiques au chemin SQL de routes/dashboard.py.
+
+Cache : chaque frame est gardée avec une clé de version lue en base
+(db_version) et revérifiée à chaque requête, donc valable avec plusieurs
+workers. Seul etat_stock_mensuel, calculé hors de l'app, n'entre pas dans
+la clé : ses changements sont vus au plus tard après ANALYTICS_TTL.
+"""
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from archive import add_months, dashboard_source, month_bounds
+
+# numpy est importé à la demande : il pèse sur le démarrage à froid
+# et n'est utile qu'en mode mémoire
+np = None
+
+ANALYTICS_MODE = os.getenv("ANALYTICS_MODE", "sql")
+CACHE_TTL = float(os.getenv("ANALYTICS_TTL", "60"))  # secondes (filet pour etat_stock_mensuel)
+CACHE_MAX_MONTHS = int(os.getenv("ANALYTICS_MAX_MONTHS", "12"))
+
+TOUT = "Tout"
+
+log = logging.getLogger(__name__)
+_numpy_missing = False  # avertissement déjà émis
+
+
+def enabled() -> bool:
+    global np, _numpy_missing
+    if ANALYTICS_MODE != "memory" or _numpy_missing:
+        return False
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # numpy optionnel : on garde le chemin SQL
+            _numpy_missing = True
+            log.warning(
+                "ANALYTICS_MODE=memory mais numpy est absent : chemin SQL utilisé "
+                "(pip install -r requirements-analytics.txt)"
+            )
+            return False
+        np = numpy
+    return True
+
+
+# ---------- Helpers ----------
+
+def _f(values) -> "np.ndarray":
+    """Colonne numérique, NULL => 0 (comme les COALESCE du SQL)."""
+    return np.array([0.0 if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _num(x):
+    """int si entier (même rendu JSON que les DECIMAL du chemin SQL)."""
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+
+def _sort_key(s: Optional[str]) -> str:
+    """Approche la collation MySQL *_ai_ci (sans accents, sans casse)."""
+    s = unicodedata.normalize("NFKD", s or "")
+    return "".join(c for c in s if not unicodedata.combining(c)).casefold()
+
+
+# ---------- Frame d'un mois ----------
+
+class MonthFrame:
+    """Colonnes NumPy d'un mois, indexées par produit (entiers)."""
+
+    def __init__(self, db: Session, annee: int, mois: int):
+        d0, d1 = month_bounds(annee, mois)
+        ym = f"{annee:04d}-{mois:02d}"
+        ym_prec = add_months(d0, -1).strftime("%Y-%m")
+
+        products = db.execute(text("""
+            SELECT code, produit, dosage, forme, unite, cible, classe, statut
+            FROM `0_products`
+        """)).mappings().all()
+
+        src = dashboard_source(db, d0)
+        mvts = db.execute(text(f"""
+            SELECT d.id_mvt_source, d.code_produit, d.classe, d.type_mouvement,
+                   d.mouvement, d.quantite, d.prix_vente, d.prix_achat, d.stock_apres
+            FROM {src} d
+            WHERE d.date_mvt >= :d0 AND d.date_mvt < :d1
+        """), {"d0": d0, "d1": d1}).mappings().all()
+
+        etats = db.execute(text("""
+            SELECT esm.code_prod, esm.stock, esm.cmm, esm.etat,
+                   LEFT(CAST(esm.mois AS CHAR), 7) AS ym
+            FROM etat_stock_mensuel esm
+            WHERE LEFT(CAST(esm.mois AS CHAR), 7) IN (:ym, :ym_prec)
+        """), {"ym": ym, "ym_prec": ym_prec}).mappings().all()
+
+        # Dictionnaires code -> idx, classe -> idx
+        codes: Dict[str, int] = {}
+        classes: Dict[Optional[str], int] = {}
+
+        def code_idx(c):
+            return codes.setdefault(c, len(codes))
+
+        def classe_idx(c):
+            return classes.setdefault(c, len(classes))
+
+        # -- produits
+        p_idx = np.array([code_idx(p["code"]) for p in products], dtype=np.int64)
+        p_classe = np.array([classe_idx(p["classe"]) for p in products], dtype=np.int64)
+        p_actif = np.array([p["statut"] == "Actif" for p in products], dtype=bool)
+
+        # -- mouvements
+        self.rows_period = len(mvts)
+        self.mv_code = np.array([code_idx(m["code_produit"]) for m in mvts], dtype=np.int64)
+        self.mv_classe = np.array([classe_idx(m["classe"]) for m in mvts], dtype=np.int64)
+        mv_type = np.array([m["type_mouvement"] for m in mvts], dtype=object)
+        mv_mvt = np.array([m["mouvement"] for m in mvts], dtype=object)
+        self.mv_entree = mv_type == "entree"
+        self.mv_sortie = mv_type == "sortie"
+        self.mv_vente = self.mv_sortie & (mv_mvt == "vente")
+        self.mv_achat = self.mv_entree & (mv_mvt == "achat")
+        self.mv_qte = _f(m["quantite"] for m in mvts)
+        self.mv_ventes = self.mv_qte * _f(m["prix_vente"] for m in mvts)
+        self.mv_achats = self.mv_qte * _f(m["prix_achat"] for m in mvts)
+        mv_stock = _f(m["stock_apres"] for m in mvts)
+        mv_id = np.array([m["id_mvt_source"] for m in mvts], dtype=np.int64)
+
+        n = len(codes)
+        # Produits par idx de code (codes sans produit => inactifs, exclus
+        # comme par le JOIN `0_products` du SQL)
+        self.prod_actif = np.zeros(n, dtype=bool)
+        self.prod_classe = np.full(n, -1, dtype=np.int64)
+        self.prod_actif[p_idx] = p_actif
+        self.prod_classe[p_idx] = p_classe
+        self.classes = classes
+
+        # Dernier mouvement par produit : tri (code, id) une seule fois
+        self.order = np.lexsort((mv_id, self.mv_code))
+        self.mv_stock = mv_stock
+
+        # -- tableau mensuel : entrées / sorties par produit (sans filtre classe)
+        qte_entree = np.bincount(self.mv_code, weights=self.mv_qte * self.mv_entree, minlength=n)
+        qte_sortie = np.bincount(self.mv_code, weights=self.mv_qte * self.mv_sortie, minlength=n)
+
+        by_code = {p["code"]: p for p in products}
+        prev = {}
+        for e in etats:
+            if e["ym"] == ym_prec:
+                prev.setdefault(e["code_prod"], e["stock"])
+
+        rows = []
+        row_classe = []
+        for e in etats:
+            if e["ym"] != ym or e["code_prod"] not in by_code:
+                continue
+            p = by_code[e["code_prod"]]
+            i = codes[e["code_prod"]]
+            rows.append({
+                "produit": p["produit"],
+                "dosage": p["dosage"],
+                "forme": p["forme"],
+                "unite": p["unite"],
+                "cible": p["cible"],
+                "quantite_initiale": prev.get(e["code_prod"]),
+                "quantite_entree": _num(qte_entree[i]),
+                "quantite_sortie": _num(qte_sortie[i]),
+                "sdu": e["stock"],
+                "cmm": e["cmm"],
+                "etat_stock": e["etat"],
+            })
+            row_classe.append(self.prod_classe[i])
+
+        order = sorted(range(len(rows)), key=lambda k: _sort_key(rows[k]["produit"]))
+        self.tableau_rows = [rows[k] for k in order]
+        self.tableau_classe = np.array([row_classe[k] for k in order], dtype=np.int64)
+
+    # ---------- Masques classe ----------
+
+    def _classe_id(self, classe: str) -> int:
+        # classe inconnue => -2 : ne matche rien (comme le SQL)
+        return self.classes.get(classe, -2)
+
+    def _mv_mask(self, classe: str) -> "np.ndarray":
+        if classe == TOUT:
+            return np.ones(self.rows_period, dtype=bool)
+        return self.mv_classe == self._classe_id(classe)
+
+    def _prod_mask(self, classe: str) -> "np.ndarray":
+        if classe == TOUT:
+            return np.ones(self.prod_classe.size, dtype=bool)
+        return self.prod_classe == self._classe_id(classe)
+
+    # ---------- Calculs ----------
+
+    def kpis(self, classe: str) -> Dict[str, Any]:
+        mask = self._mv_mask(classe)
+        prod_ok = self.prod_actif & self._prod_mask(classe)
+
+        nb_produits = int(np.unique(self.mv_code[mask]).size)
+        denom = int(prod_ok.sum())
+
+        # dernier mouvement (id max) de chaque produit parmi les lignes masquées
+        sel = self.order[mask[self.order]]
+        codes = self.mv_code[sel]
+        last = np.ones(codes.size, dtype=bool)
+        last[:-1] = codes[:-1] != codes[1:]
+        last_rows = sel[last]
+        num = int((prod_ok[self.mv_code[last_rows]] & (self.mv_stock[last_rows] > 0)).sum())
+
+        total_ventes = float(self.mv_ventes[mask & self.mv_vente].sum())
+        total_achats = float(self.mv_achats[mask & self.mv_achat].sum())
+
+        return {
+            "rows_period": self.rows_period,
+            "nb_produits": nb_produits,
+            "num": num,
+            "denom": denom,
+            "total_ventes": total_ventes,
+            "total_achats": total_achats,
+        }
+
+    def tableau(self, classe: str) -> List[Dict[str, Any]]:
+        if classe == TOUT:
+            return list(self.tableau_rows)
+        keep = np.flatnonzero(self.tableau_classe == self._classe_id(classe))
+        return [self.tableau_rows[k] for k in keep]
+
+
+# ---------- Cache ----------
+
+_cache: "OrderedDict[tuple, tuple[tuple, float, MonthFrame]]" = OrderedDict()
+_lock = threading.Lock()
+_generation = 0  # incrémenté à chaque invalidation
+
+
+def db_version(db: Session) -> tuple:
+    """
+    Clé de version des données, partagée par tous les workers :
+    insertions (MAX(id), MAX(updated_at), lus sur index) + compteur
+    data_version pour les éditions et l'archivage (cf. bump_version).
+    """
+    row = db.execute(text("""
+        SELECT
+          (SELECT MAX(id) FROM `0_mouvement_stock`) AS mvt,
+          (SELECT MAX(updated_at) FROM `0_products`) AS prod,
+          (SELECT n FROM data_version WHERE id = 1) AS n
+    """)).first()
+    return tuple(row)
+
+
+def bump_version(db) -> None:
+    """
+    Signale une écriture que db_version ne verrait pas (édition, archivage).
+    À appeler dans la transaction de l'écriture, juste avant le commit.
+    """
+    db.execute(text("UPDATE data_version SET n = n + 1 WHERE id = 1"))
+
+
+def invalidate() -> None:
+    """À appeler après une écriture : vide tout de suite le cache local."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
+
+
+def get_frame(db: Session, annee: int, mois: int) -> MonthFrame:
+    key = (annee, mois)
+    # lue avant le chargement : une écriture pendant celui-ci changera
+    # la version et la frame sera rechargée à la requête suivante
+    version = db_version(db)
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == version and now - hit[1] < CACHE_TTL:
+            _cache.move_to_end(key)
+            return hit[2]
+        gen = _generation
+
+    frame = MonthFrame(db, annee, mois)
+
+    with _lock:
+        # une écriture pendant le chargement : on sert la frame sans la garder
+        if gen != _generation:
+            return frame
+        _cache[key] = (version, now, frame)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_MONTHS:
+            _cache.popitem(last=False)
+    return frame
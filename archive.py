@@ -0,0 +1,281 @@
+"""
+Archivage des mois clos de `0_mouvement_stock` / `tb_dashboard`.
+
+- les lignes d'un mois clos sont déplacées vers les tables *_archive
+  (partitionnées par mois, cf. sql/002_archive_mouvements.sql)
+- les agrégats d'un mois archivé se lisent dans mouvement_jour, qui garde
+  tout l'historique (classe du mouvement, prix de tb_dashboard) : il
+  n'est pas touché par l'archivage
+- les routes de lecture n'ajoutent l'archive (UNION ALL) que si la
+  période demandée commence avant l'horizon d'archivage
+
+Usage :
+    python archive.py status
+    python archive.py run --keep-months 3 [--dry-run]
+"""
+import argparse
+from datetime import date
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+HOT_MVT = "`0_mouvement_stock`"
+ARCHIVE_MVT = "`0_mouvement_stock_archive`"
+HOT_DASH = "tb_dashboard"
+ARCHIVE_DASH = "tb_dashboard_archive"
+
+
+# ---------- Helpers dates ----------
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def add_months(d: date, n: int) -> date:
+    m = d.year * 12 + (d.month - 1) + n
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def month_bounds(annee: int, mois: int) -> Tuple[date, date]:
+    """[1er du mois, 1er du mois suivant) : filtre sargable (index / partitions)."""
+    d0 = date(annee, mois, 1)
+    return d0, add_months(d0, 1)
+
+
+# ---------- Lecture : choix de la source ----------
+
+def archive_horizon(db: Session) -> Optional[date]:
+    """1er jour du dernier mois archivé (None si rien n'est archivé)."""
+    return db.execute(text("SELECT MAX(mois) FROM archive_mois")).scalar()
+
+
+def _as_date(value) -> Optional[date]:
+    """
+    date / datetime / chaîne 'YYYY-M-D' (MySQL accepte les mois et jours
+    sur un chiffre, on fait pareil) ; None si illisible.
+    """
+    if isinstance(value, date):  # datetime compris
+        return value if type(value) is date else value.date()
+    try:
+        day = str(value).strip().split()[0].split("T")[0]
+        y, m, d = (int(x) for x in day.split("-"))
+        return date(y, m, d)
+    except (ValueError, IndexError):
+        return None
+
+
+def needs_archive(db: Session, date_from) -> bool:
+    """
+    True si la période commence avant la fin du dernier mois archivé.
+    date_from peut être une date ou une chaîne (paramètre brut de la route).
+    """
+    horizon = archive_horizon(db)
+    if horizon is None:
+        return False
+    d = _as_date(date_from)
+    # date illisible : on garde l'archive plutôt que de perdre des lignes
+    return d is None or d < add_months(horizon, 1)
+
+
+def dashboard_source(db: Session, date_from) -> str:
+    """
+    Source à mettre dans le FROM à la place de tb_dashboard.
+    Le filtre de dates de la requête appelante est poussé dans chaque
+    branche de l'UNION par MySQL (>= 8.0.22), donc seules les partitions
+    utiles de l'archive sont lues.
+    """
+    if not needs_archive(db, date_from):
+        return HOT_DASH
+    return f"(SELECT * FROM {HOT_DASH} UNION ALL SELECT * FROM {ARCHIVE_DASH})"
+
+
+# Une ligne par mouvement, au format des agrégats de month_agg_source
+_HOT_AGG = f"""
+    SELECT
+      d.code_produit, d.classe, d.type_mouvement, d.mouvement,
+      1 AS nb,
+      COALESCE(d.quantite, 0) AS quantite,
+      COALESCE(d.quantite, 0) * COALESCE(d.prix_vente, 0) AS total_ventes,
+      COALESCE(d.quantite, 0) * COALESCE(d.prix_achat, 0) AS total_achats
+    FROM {HOT_DASH} d
+    WHERE d.date_mvt >= :d0 AND d.date_mvt < :d1
+"""
+
+
+def month_agg_source(db: Session, d0: date) -> str:
+    """
+    Source agrégée d'un mois (paramètres :d0 / :d1 attendus) :
+    colonnes code_produit, classe, type_mouvement, mouvement, nb,
+    quantite, total_ventes, total_achats.
+    Mois archivé => agrégats journaliers de mouvement_jour (mêmes règles
+    que tb_dashboard, lignes saisies après coup comprises), au lieu de
+    relire les partitions de l'archive.
+    """
+    if not needs_archive(db, d0):
+        return f"({_HOT_AGG})"
+    return """(
+        SELECT code_produit, classe, type_mouvement, mouvement,
+               nb, quantite, total_ventes, total_achats
+        FROM mouvement_jour
+        WHERE jour >= :d0 AND jour < :d1
+          AND nb > 0
+    )"""
+
+
+# ---------- Écriture : archivage ----------
+
+def _partition_name(d0: date) -> str:
+    return f"p{d0.year:04d}{d0.month:02d}"
+
+
+def _ensure_partition(conn, table: str, d0: date) -> None:
+    """
+    Crée la partition du mois (DDL => hors transaction) en découpant la
+    partition qui contient d0 : pmax en général, une partition plus large
+    si un mois plus récent a déjà été archivé (rattrapage d'un trou).
+    """
+    d1 = add_months(d0, 1)
+    parts = conn.execute(text("""
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = :t
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """), {"t": table.strip("`")}).mappings().all()
+
+    # bornes : "'2025-02-01'" ou MAXVALUE ; la 1re qui dépasse d0 contient d0
+    for p in parts:
+        bound = p["bound"].strip("'")
+        if bound == "MAXVALUE" or bound > d0.isoformat():
+            break
+    else:
+        raise RuntimeError(f"{table} : aucune partition ne couvre {d0}")
+
+    if bound == d1.isoformat():
+        return  # la partition du mois existe déjà
+    upper = "MAXVALUE" if bound == "MAXVALUE" else f"'{bound}'"
+    conn.execute(text(f"""
+        ALTER TABLE {table} REORGANIZE PARTITION {p["name"]} INTO (
+          PARTITION {_partition_name(d0)} VALUES LESS THAN ('{d1.isoformat()}'),
+          PARTITION {p["name"]} VALUES LESS THAN ({upper})
+        )
+    """))
+
+
+def months_to_archive(conn, cutoff: date) -> list[date]:
+    """Mois (1er jour) ayant encore des lignes chaudes avant cutoff."""
+    rows = conn.execute(text(f"""
+        SELECT DISTINCT DATE_FORMAT(date_mvt, '%Y-%m-01') AS mois
+        FROM {HOT_MVT}
+        WHERE date_mvt < :cutoff
+        ORDER BY mois
+    """), {"cutoff": cutoff}).scalars().all()
+    return [date.fromisoformat(str(m)) for m in rows]
+
+
+def archive_month(engine, d0: date) -> int:
+    """
+    Déplace un mois vers l'archive. Idempotent : relancé sur un mois déjà
+    archivé, il balaie les lignes saisies après coup.
+    Retourne le nombre de mouvements déplacés.
+    """
+    d1 = add_months(d0, 1)
+    params = {"d0": d0, "d1": d1}
+
+    with engine.connect() as conn:
+        _ensure_partition(conn, ARCHIVE_MVT, d0)
+        _ensure_partition(conn, ARCHIVE_DASH, d0)
+        conn.commit()
+
+    # Tout le reste en une transaction : tout passe ou rollback
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            INSERT INTO {ARCHIVE_DASH}
+            SELECT * FROM {HOT_DASH}
+            WHERE date_mvt >= :d0 AND date_mvt < :d1
+        """), params)
+        moved = conn.execute(text(f"""
+            INSERT INTO {ARCHIVE_MVT}
+            SELECT * FROM {HOT_MVT}
+            WHERE date_mvt >= :d0 AND date_mvt < :d1
+        """), params).rowcount
+
+        conn.execute(text(f"""
+            DELETE FROM {HOT_DASH}
+            WHERE date_mvt >= :d0 AND date_mvt < :d1
+        """), params)
+        conn.execute(text(f"""
+            DELETE FROM {HOT_MVT}
+            WHERE date_mvt >= :d0 AND date_mvt < :d1
+        """), params)
+
+        conn.execute(text("""
+            INSERT INTO archive_mois (mois, nb_mouvements)
+            VALUES (:d0, :n)
+            ON DUPLICATE KEY UPDATE nb_mouvements = nb_mouvements + VALUES(nb_mouvements)
+        """), {"d0": d0, "n": moved})
+
+        # les frames du mode mémoire doivent relire la source (archive)
+        from analytics import bump_version
+        bump_version(conn)
+
+    return moved
+
+
+def run(engine, keep_months: int, dry_run: bool = False) -> None:
+    # on garde le mois courant + keep_months mois précédents en table chaude
+    cutoff = add_months(month_start(date.today()), -keep_months)
+    with engine.connect() as conn:
+        months = months_to_archive(conn, cutoff)
+
+    if not months:
+        print(f"Rien à archiver avant {cutoff}.")
+        return
+
+    for d0 in months:
+        if dry_run:
+            print(f"[dry-run] {d0:%Y-%m} serait archivé")
+            continue
+        n = archive_month(engine, d0)
+        print(f"{d0:%Y-%m} : {n} mouvements archivés")
+
+
+def status(engine) -> None:
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT mois, nb_mouvements, archived_at
+            FROM archive_mois
+            ORDER BY mois
+        """)).mappings().all()
+    if not rows:
+        print("Aucun mois archivé.")
+        return
+    for r in rows:
+        print(f"{r['mois']:%Y-%m}  {r['nb_mouvements']:>8}  {r['archived_at']}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Archivage des mois clos")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="archiver les mois clos")
+    p_run.add_argument("--keep-months", type=int, default=3,
+                       help="nb de mois clos gardés en table chaude (défaut: 3)")
+    p_run.add_argument("--dry-run", action="store_true")
+
+    sub.add_parser("status", help="lister les mois archivés")
+
+    args = parser.parse_args(argv)
+
+    from db import get_engine
+
+    engine = get_engine()
+    if args.cmd == "run":
+        run(engine, args.keep_months, args.dry_run)
+    else:
+        status(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark : latence par changement de classe, chemin SQL vs mode mémoire
+(analytics.py), pour /kpis et /tableau_mensuel. Vérifie aussi que les
+deux chemins renvoient les mêmes chiffres.
+
+    DATABASE_URL=... python bench/analytics_classe_switch.py --annee 2026 --mois 1
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+from db import SessionLocal, get_engine
+from routes.dashboard import get_classes, get_kpis, tableau_mensuel
+
+
+def run_all(db, annee: int, mois: int, classes: list[str]):
+    """Parcourt toutes les classes ; renvoie (latences ms, résultats)."""
+    lat, out = [], {}
+    for c in classes:
+        t0 = time.perf_counter()
+        k = get_kpis(annee=annee, mois=mois, classe=c, db=db)
+        t = tableau_mensuel(annee=annee, mois=mois, classe=c, db=db)
+        lat.append((time.perf_counter() - t0) * 1000)
+        out[c] = (k, t)
+    return lat, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--annee", type=int, required=True)
+    parser.add_argument("--mois", type=int, required=True)
+    args = parser.parse_args()
+
+    analytics.ANALYTICS_MODE = "memory"
+    if not analytics.enabled():
+        sys.exit("numpy absent : pip install numpy")
+
+    get_engine()
+    db = SessionLocal()
+    try:
+        classes = ["Tout"] + get_classes(db=db)["classes"]
+
+        analytics.ANALYTICS_MODE = "sql"
+        lat_sql, res_sql = run_all(db, args.annee, args.mois, classes)
+
+        analytics.ANALYTICS_MODE = "memory"
+        analytics.invalidate()
+        t0 = time.perf_counter()
+        analytics.get_frame(db, args.annee, args.mois)
+        load_ms = (time.perf_counter() - t0) * 1000
+        lat_mem, res_mem = run_all(db, args.annee, args.mois, classes)
+    finally:
+        db.close()
+
+    print(f"{len(classes)} classes, mois {args.annee}-{args.mois:02d}")
+    print(f"SQL     : médiane {statistics.median(lat_sql):8.2f} ms / changement de classe")
+    print(f"mémoire : médiane {statistics.median(lat_mem):8.2f} ms / changement de classe "
+          f"(chargement initial {load_ms:.1f} ms)")
+
+    diffs = [c for c in classes if res_sql[c] != res_mem[c]]
+    if diffs:
+        print(f"⚠️ résultats différents pour : {', '.join(diffs)}")
+        sys.exit(1)
+    print("✅ résultats identiques")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark : requêtes d'historique sur la table chaude seule vs la même
+table non archivée (= ce que coûtait tb_dashboard avant archivage).
+
+La référence est une copie non partitionnée (tb_dashboard_bench_full,
+mêmes index que tb_dashboard) remplie avec chaude + archive : comparer
+à l'UNION ALL ne mesurerait rien, l'élagage des partitions de l'archive
+masquant justement ce que l'archivage fait gagner.
+
+    DATABASE_URL=... python bench/archive_hot_partition.py --repeat 20 [--keep]
+
+À lancer après `python archive.py run` sur une base de test.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from archive import HOT_DASH, ARCHIVE_DASH, add_months, month_start, month_bounds
+
+# même forme que /api/dashboard/movements et /movement_hist
+SQL_LIST = """
+    SELECT date_mvt, nom_produit, type_mouvement, mouvement, quantite, stock_apres
+    FROM {src} d
+    WHERE date_mvt BETWEEN :date_from AND :date_to
+    ORDER BY date_mvt DESC
+    LIMIT 5000
+"""
+SQL_MONTH = """
+    SELECT d.mouvement, d.type_mouvement, COUNT(*) AS nb,
+           SUM(COALESCE(d.quantite,0) * COALESCE(d.prix_vente,0)) AS ventes
+    FROM {src} d
+    WHERE d.date_mvt >= :d0 AND d.date_mvt < :d1
+    GROUP BY d.mouvement, d.type_mouvement
+"""
+
+FULL_COPY = "tb_dashboard_bench_full"
+
+SOURCES = {
+    "chaude": HOT_DASH,
+    "non archivée": FULL_COPY,
+}
+
+
+def build_full_copy(conn) -> int:
+    """Recrée la table « avant archivage » : chaude + archive, une seule table."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {FULL_COPY}"))
+    conn.execute(text(f"CREATE TABLE {FULL_COPY} LIKE {HOT_DASH}"))
+    n = conn.execute(text(f"""
+        INSERT INTO {FULL_COPY}
+        SELECT * FROM {HOT_DASH}
+        UNION ALL
+        SELECT * FROM {ARCHIVE_DASH}
+    """)).rowcount
+    conn.execute(text(f"ANALYZE TABLE {FULL_COPY}"))
+    conn.commit()
+    return n
+
+
+def timed(conn, sql: str, params: dict, repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def run_cases(conn, cases: dict, repeat: int) -> None:
+    for label, (sql, params) in cases.items():
+        res = {}
+        for name, src in SOURCES.items():
+            ms = timed(conn, sql.format(src=src), params, repeat)
+            res[name] = statistics.median(ms)
+            print(f"{label:<22} {name:<15} médiane {res[name]:8.2f} ms  p95 {sorted(ms)[int(0.95 * (len(ms) - 1))]:8.2f} ms")
+        if res["chaude"] > 0:
+            print(f"{'':<22} speedup x{res['non archivée'] / res['chaude']:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true",
+                        help=f"garder {FULL_COPY} après le bench")
+    args = parser.parse_args()
+
+    from db import get_engine
+
+    engine = get_engine()
+
+    today = date.today()
+    d0, d1 = month_bounds(today.year, today.month)
+    cases = {
+        "liste 30 jours": (SQL_LIST, {"date_from": add_months(month_start(today), -1), "date_to": today}),
+        "agrégat mois courant": (SQL_MONTH, {"d0": d0, "d1": d1}),
+    }
+
+    with engine.connect() as conn:
+        n = build_full_copy(conn)
+        print(f"{FULL_COPY} : {n} lignes (chaude + archive)")
+        try:
+            run_cases(conn, cases, args.repeat)
+        finally:
+            if not args.keep:
+                conn.execute(text(f"DROP TABLE IF EXISTS {FULL_COPY}"))
+                conn.commit()
+
+
+if __name__ == "__main__":
+    main()
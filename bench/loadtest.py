@@ -0,0 +1,614 @@
+"""
+Test de charge : combien de comptoirs / tableaux de bord une instance tient.
+
+Rejoue un trafic de pharmacie réaliste contre l'app (uvicorn, 1 process) :
+- comptoirs   : scan code-barres GET /api/products/{code} puis vente POST /api/mouvements
+- correcteurs : GET /api/movements/edit puis PUT /api/movements/edit (avec version)
+- tableaux de bord : rafraîchissement périodique kpis / hist / tableau / produits
+
+La charge monte par paliers (nb de comptoirs). Pour chaque palier et chaque
+route : débit, latences p50/p95/p99, erreurs, 429 et attente du pool DB.
+
+La base est une base MySQL locale de test, remplie à l'échelle voulue :
+
+    export LOADTEST_DATABASE_URL=mysql+pymysql://root:pw@127.0.0.1:3306/pharma_load
+    python bench/loadtest.py seed --products 2000 --days 365 --per-day 200
+    python bench/loadtest.py run --steps 2,4,8,16,32 --step-seconds 20
+
+⚠️ `seed` supprime et recrée les tables : uniquement sur une base locale.
+db.py exige TLS : le serveur MySQL local doit l'accepter (par défaut en 8.x).
+"""
+import argparse
+import contextvars
+import datetime as dt
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+URL_ENV = "LOADTEST_DATABASE_URL"
+
+CLASSES = ["Antibiotiques", "Antalgiques", "Antipaludiques", "Vitamines",
+           "Antihypertenseurs", "Antidiabétiques", "Dermatologie", "ORL"]
+FORMES = ["Comprimé", "Gélule", "Sirop", "Injectable", "Pommade"]
+CIBLES = ["Adulte", "Enfant"]
+
+
+def _load_url() -> str:
+    url = os.environ.get(URL_ENV)
+    if not url:
+        sys.exit(f"{URL_ENV} manquant (base MySQL locale de test)")
+    return url
+
+
+# =========================
+# Schéma de substitution
+# =========================
+# Tables de la base de prod d'avant les migrations du dépôt ; seed les
+# remplit puis applique sql/*.sql dans l'ordre (comme une mise à jour de
+# la prod, reprise de mouvement_jour comprise) : le banc ne peut pas
+# dériver du vrai schéma.
+SQL_DIR = os.path.join(ROOT, "sql")
+
+SCHEMA = [
+    "DROP TABLE IF EXISTS mouvement_jour, data_version, archive_mois, tb_dashboard_archive, "
+    "`0_mouvement_stock_archive`, tb_dashboard, etat_stock_mensuel, "
+    "`0_mouvement_stock`, `0_products`",
+    """
+    CREATE TABLE `0_products` (
+      code VARCHAR(50) NOT NULL PRIMARY KEY,
+      produit VARCHAR(255) NOT NULL,
+      forme VARCHAR(100), dosage VARCHAR(100), classe VARCHAR(150),
+      cible VARCHAR(150), unite VARCHAR(30),
+      prix_achat DECIMAL(12,2), prix_vente DECIMAL(12,2),
+      stock_actuel INT, date_creation DATE,
+      statut VARCHAR(10) NOT NULL DEFAULT 'Actif'
+    )
+    """,
+    """
+    CREATE TABLE `0_mouvement_stock` (
+      id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+      date_mvt DATE NOT NULL,
+      code_prod VARCHAR(50) NOT NULL,
+      type_mvt VARCHAR(10) NOT NULL,
+      mouvement VARCHAR(50) NOT NULL,
+      quantite INT NOT NULL DEFAULT 1,
+      commentaire VARCHAR(255),
+      KEY idx_mvt_prod_date (code_prod, date_mvt)
+    )
+    """,
+    """
+    CREATE TABLE tb_dashboard (
+      id_mvt_source INT NOT NULL PRIMARY KEY,
+      code_produit VARCHAR(50) NOT NULL,
+      date_mvt DATE NOT NULL,
+      nom_produit VARCHAR(255), forme VARCHAR(100), dosage VARCHAR(100),
+      classe VARCHAR(150), cible VARCHAR(150), unite VARCHAR(30),
+      prix_achat DECIMAL(12,2), prix_vente DECIMAL(12,2),
+      type_mouvement VARCHAR(10), mouvement VARCHAR(50),
+      quantite INT, stock_apres INT, commentaire VARCHAR(255),
+      KEY idx_tb_dashboard_prod (code_produit)
+    )
+    """,
+    """
+    CREATE TABLE etat_stock_mensuel (
+      code_prod VARCHAR(50) NOT NULL,
+      mois DATE NOT NULL,
+      stock INT, cmm DECIMAL(12,2), etat VARCHAR(30),
+      PRIMARY KEY (code_prod, mois)
+    )
+    """,
+]
+
+
+def migrations() -> list:
+    """Instructions de sql/*.sql, dans l'ordre des fichiers."""
+    out = []
+    for name in sorted(f for f in os.listdir(SQL_DIR) if f.endswith(".sql")):
+        with open(os.path.join(SQL_DIR, name), encoding="utf-8") as f:
+            lines = [l for l in f if not l.lstrip().startswith("--")]
+        out += [s.strip() for s in "".join(lines).split(";") if s.strip()]
+    return out
+
+
+# Créés après le remplissage en masse (sinon un trigger par ligne)
+TRIGGERS = [
+    """
+    CREATE TRIGGER trg_mvt_ai AFTER INSERT ON `0_mouvement_stock` FOR EACH ROW
+    BEGIN
+      UPDATE `0_products`
+         SET stock_actuel = COALESCE(stock_actuel, 0)
+                            + IF(NEW.type_mvt = 'entree', NEW.quantite, -NEW.quantite)
+       WHERE code = NEW.code_prod;
+      INSERT INTO tb_dashboard
+        (id_mvt_source, code_produit, date_mvt, nom_produit, forme, dosage, classe,
+         cible, unite, prix_achat, prix_vente, type_mouvement, mouvement, quantite,
+         stock_apres, commentaire)
+      SELECT NEW.id, NEW.code_prod, NEW.date_mvt, p.produit, p.forme, p.dosage, p.classe,
+             p.cible, p.unite, p.prix_achat, p.prix_vente, NEW.type_mvt, NEW.mouvement,
+             NEW.quantite, p.stock_actuel, NEW.commentaire
+      FROM `0_products` p
+      WHERE p.code = NEW.code_prod;
+    END
+    """,
+    """
+    CREATE TRIGGER trg_mvt_au AFTER UPDATE ON `0_mouvement_stock` FOR EACH ROW
+    BEGIN
+      UPDATE tb_dashboard
+         SET date_mvt = NEW.date_mvt, type_mouvement = NEW.type_mvt,
+             mouvement = NEW.mouvement, quantite = NEW.quantite,
+             commentaire = NEW.commentaire
+       WHERE id_mvt_source = NEW.id;
+    END
+    """,
+]
+
+# (mouvement, type, poids, quantité min, max)
+MIX = [
+    ("vente", "sortie", 80, 1, 3),
+    ("achat", "entree", 12, 20, 100),
+    ("perte", "sortie", 5, 1, 2),
+    ("peremption", "sortie", 3, 1, 5),
+]
+
+
+def _etat(stock: int, cmm: float) -> str:
+    if stock <= 0:
+        return "Rupture"
+    if stock < cmm:
+        return "Sous-stock"
+    if cmm > 0 and stock > 3 * cmm:
+        return "Surstock"
+    return "Normal"
+
+
+def seed(args) -> None:
+    from sqlalchemy import create_engine, text
+    from archive import add_months
+
+    url = _load_url()
+    host = urlparse(url.replace("+pymysql", "")).hostname
+    if host not in ("localhost", "127.0.0.1", "::1") and not args.force:
+        sys.exit(f"Refus de remplir {host} : base non locale (--force pour passer outre)")
+
+    rnd = random.Random(args.seed)
+    engine = create_engine(url)
+    today = dt.date.today()
+    start = today - dt.timedelta(days=args.days)
+
+    products = []
+    for i in range(args.products):
+        pa = round(rnd.uniform(100, 5000), 2)
+        products.append({
+            "code": f"{100000 + i}",
+            "produit": f"Produit {i:05d}",
+            "forme": rnd.choice(FORMES),
+            "dosage": f"{rnd.choice([5, 10, 50, 100, 250, 500])} mg",
+            "classe": rnd.choice(CLASSES),
+            "cible": rnd.choice(CIBLES),
+            "unite": "boîte",
+            "prix_achat": pa,
+            "prix_vente": round(pa * rnd.uniform(1.15, 1.6), 2),
+            "stock_actuel": rnd.randint(50, 500),
+            "date_creation": start,
+            "statut": "Actif" if rnd.random() < 0.95 else "Inactif",
+        })
+
+    # quelques produits très demandés (loi de puissance)
+    weights = [1 / (k + 1) ** 0.8 for k in range(len(products))]
+    stock = {p["code"]: p["stock_actuel"] for p in products}
+
+    mvts, dash = [], []
+    month_end = {}                      # (code, mois) -> stock fin de mois
+    sorties = defaultdict(int)          # (code, mois) -> quantité sortie
+    mvt_id = 0
+    for d in range(args.days + 1):
+        day = start + dt.timedelta(days=d)
+        picks = rnd.choices(products, weights=weights, k=args.per_day)
+        for p in picks:
+            mouvement, type_mvt, _, qmin, qmax = rnd.choices(MIX, weights=[m[2] for m in MIX])[0]
+            q = rnd.randint(qmin, qmax)
+            code = p["code"]
+            stock[code] += q if type_mvt == "entree" else -q
+            mvt_id += 1
+            mvts.append({"id": mvt_id, "date_mvt": day, "code_prod": code, "type_mvt": type_mvt,
+                         "mouvement": mouvement, "quantite": q, "commentaire": None})
+            dash.append({"id_mvt_source": mvt_id, "code_produit": code, "date_mvt": day,
+                         "nom_produit": p["produit"], "forme": p["forme"], "dosage": p["dosage"],
+                         "classe": p["classe"], "cible": p["cible"], "unite": p["unite"],
+                         "prix_achat": p["prix_achat"], "prix_vente": p["prix_vente"],
+                         "type_mouvement": type_mvt, "mouvement": mouvement, "quantite": q,
+                         "stock_apres": stock[code], "commentaire": None})
+            mois = day.replace(day=1)
+            month_end[(code, mois)] = stock[code]
+            if type_mvt == "sortie":
+                sorties[(code, mois)] += q
+
+    # état de stock mensuel : report du stock les mois sans mouvement
+    months, m = [], start.replace(day=1)
+    while m <= today:
+        months.append(m)
+        m = add_months(m, 1)
+    etats = []
+    for p in products:
+        code, last = p["code"], p["stock_actuel"]
+        hist = []
+        for m in months:
+            last = month_end.get((code, m), last)
+            hist.append(sorties.get((code, m), 0))
+            cmm = statistics.mean(hist[-3:])
+            etats.append({"code_prod": code, "mois": m, "stock": last,
+                          "cmm": round(cmm, 2), "etat": _etat(last, cmm)})
+
+    for p in products:
+        p["stock_actuel"] = stock[p["code"]]
+
+    def bulk(conn, table, rows):
+        if not rows:
+            return
+        cols = list(rows[0])
+        sql = text(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})")
+        for i in range(0, len(rows), 5000):
+            conn.execute(sql, rows[i:i + 5000])
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for ddl in SCHEMA:
+            conn.execute(text(ddl))
+        bulk(conn, "`0_products`", products)
+        bulk(conn, "`0_mouvement_stock`", mvts)
+        bulk(conn, "tb_dashboard", dash)
+        bulk(conn, "etat_stock_mensuel", etats)
+        # SQL brut : pas de bind :param dans les fichiers de migration
+        for stmt in migrations():
+            conn.exec_driver_sql(stmt)
+        for trg in TRIGGERS:
+            conn.execute(text(trg))
+    engine.dispose()
+
+    print(f"Base remplie en {time.perf_counter() - t0:.1f}s : {len(products)} produits, "
+          f"{len(mvts)} mouvements, {len(etats)} états mensuels")
+
+
+# =========================
+# Serveur instrumenté
+# =========================
+# Sous-processus : l'app + attente du pool mesurée par route
+# (le client envoie X-Load-Route, propagé jusqu'au thread de la route).
+
+def serve(args) -> None:
+    import uvicorn
+
+    os.environ["DATABASE_URL"] = _load_url()
+    # chaque client virtuel a son IP via X-Forwarded-For (1 proxy simulé)
+    os.environ.setdefault("TRUSTED_PROXIES", "1")
+
+    from db import get_engine
+    import main
+
+    route_var = contextvars.ContextVar("load_route", default="?")
+    waits = defaultdict(list)
+    lock = threading.Lock()
+
+    # attente en file seulement : on chronomètre QueuePool._do_get moins
+    # l'ouverture d'une nouvelle connexion ; le pre-ping (après _do_get)
+    # n'est pas compté
+    pool = get_engine().pool
+    do_get, create = pool._do_get, pool._create_connection
+    local = threading.local()
+
+    def timed_create():
+        t0 = time.perf_counter()
+        try:
+            return create()
+        finally:
+            local.created += time.perf_counter() - t0
+
+    def timed_do_get():
+        local.created = 0.0
+        t0 = time.perf_counter()
+        conn = do_get()
+        waited = (time.perf_counter() - t0 - local.created) * 1000
+        with lock:
+            waits[route_var.get()].append(waited)
+        return conn
+
+    pool._create_connection = timed_create
+    pool._do_get = timed_do_get
+
+    async def app(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/__loadtest/pool":
+            with lock:
+                body = json.dumps(dict(waits)).encode()
+                waits.clear()
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        label = "?"
+        for name, value in scope.get("headers", []):
+            if name == b"x-load-route":
+                label = value.decode()
+        token = route_var.set(label)
+        try:
+            await main.app(scope, receive, send)
+        finally:
+            route_var.reset(token)
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# =========================
+# Clients virtuels
+# =========================
+
+class Client:
+    """Connexion keep-alive ; chaque client a sa propre IP (seau à jetons)."""
+
+    def __init__(self, port: int, ip: str, record):
+        self.port = port
+        self.ip = ip
+        self.record = record
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def call(self, route: str, method: str, path: str, body=None):
+        headers = {"X-Load-Route": route, "X-Forwarded-For": self.ip}
+        data = None
+        if body is not None:
+            data = json.dumps(body, default=str)
+            headers["Content-Type"] = "application/json"
+        t0 = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=data, headers=headers)
+            resp = self.conn.getresponse()
+            raw = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            raw, status = b"", 0
+        self.record(route, status, (time.perf_counter() - t0) * 1000)
+        if status == 200 or status == 201:
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return None
+        return None
+
+
+def counter_user(c: Client, ctx, stop: threading.Event, rnd: random.Random) -> None:
+    while not stop.is_set():
+        code = rnd.choice(ctx["codes"])
+        product = c.call("lookup", "GET", f"/api/products/{code}")
+        if product is not None:
+            c.call("sale", "POST", "/api/mouvements", {
+                "date_mvt": dt.date.today(), "code_prod": code,
+                "type_mvt": "sortie", "mouvement": "vente", "quantite": 1,
+            })
+        stop.wait(rnd.uniform(0, 2 * ctx["think"]))
+
+
+def editor_user(c: Client, ctx, stop: threading.Event, rnd: random.Random) -> None:
+    while not stop.is_set():
+        code, day = rnd.choice(ctx["edit_pairs"])
+        rows = c.call("edit_get", "GET", "/api/movements/edit?" + urlencode({"code_prod": code, "day": day}))
+        if rows:
+            r = rnd.choice(rows)
+            c.call("edit_put", "PUT", "/api/movements/edit", [{
+                "id": r["id"], "version": r["version"],
+                "commentaire": f"correction {rnd.randint(1, 999)}",
+            }])
+        stop.wait(rnd.uniform(0, 10 * ctx["think"]))
+
+
+def dashboard_user(c: Client, ctx, stop: threading.Event, rnd: random.Random) -> None:
+    today = dt.date.today()
+    month = {"annee": today.year, "mois": today.month}
+    while not stop.is_set():
+        classe = rnd.choice(["ALL"] + CLASSES)
+        q = urlencode({**month, "classe": classe})
+        c.call("kpis", "GET", f"/api/dashboard/kpis?{q}")
+        c.call("movement_hist", "GET", f"/api/dashboard/movement_hist?{q}")
+        c.call("etat_stock_share", "GET", f"/api/dashboard/etat_stock_share?{q}")
+        c.call("tableau_mensuel", "GET", f"/api/dashboard/tableau_mensuel?{q}")
+        c.call("movements", "GET", "/api/dashboard/movements?" + urlencode({
+            "date_from": today - dt.timedelta(days=30), "date_to": today, "limit": 5000}))
+        # rechargement complet (sans ?since=) : le cas le plus cher
+        c.call("list_products", "GET", "/api/dashboard/list_products")
+        stop.wait(ctx["dashboard_period"])
+
+
+# =========================
+# Pilotage
+# =========================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def _context(args) -> dict:
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(_load_url())
+    with engine.connect() as conn:
+        codes = conn.execute(text("SELECT code FROM `0_products` WHERE statut = 'Actif'")).scalars().all()
+        pairs = conn.execute(text("""
+            SELECT code_prod, date_mvt FROM `0_mouvement_stock`
+            WHERE date_mvt >= CURDATE() - INTERVAL 7 DAY
+            GROUP BY code_prod, date_mvt
+            LIMIT 2000
+        """)).all()
+    engine.dispose()
+    if not codes or not pairs:
+        sys.exit("Base vide : lancer d'abord `seed`")
+    return {
+        "codes": list(codes),
+        "edit_pairs": [(c, d) for c, d in pairs],
+        "think": args.think,
+        "dashboard_period": args.dashboard_period,
+    }
+
+
+def run_step(port: int, ctx: dict, counters: int, seconds: float, seed: int) -> dict:
+    samples = defaultdict(list)  # route -> [(status, ms)]
+    lock = threading.Lock()
+
+    def record(route, status, ms):
+        with lock:
+            samples[route].append((status, ms))
+
+    users = (
+        [(counter_user, i) for i in range(counters)]
+        + [(editor_user, 1000 + i) for i in range(max(1, counters // 10))]
+        + [(dashboard_user, 2000 + i) for i in range(max(1, counters // 5))]
+    )
+    stop = threading.Event()
+    threads = []
+    for fn, n in users:
+        client = Client(port, f"10.0.{n // 250}.{n % 250 + 1}", record)
+        rnd = random.Random(seed * 100_003 + n)
+        t = threading.Thread(target=fn, args=(client, ctx, stop, rnd), daemon=True)
+        threads.append(t)
+
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    stop.wait(seconds)
+    stop.set()
+    for t in threads:
+        t.join(timeout=30)
+    elapsed = time.perf_counter() - t0
+
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/__loadtest/pool")
+    pool_waits = json.loads(conn.getresponse().read())
+    conn.close()
+
+    routes = {}
+    for route, rows in sorted(samples.items()):
+        ok = [ms for st, ms in rows if 200 <= st < 300]
+        waits = pool_waits.get(route, [])
+        routes[route] = {
+            "n": len(rows),
+            "rps": len(ok) / elapsed,
+            "p50": _pct(ok, 0.50),
+            "p95": _pct(ok, 0.95),
+            "p99": _pct(ok, 0.99),
+            "err": sum(1 for st, _ in rows if st == 0 or st >= 500),
+            "r429": sum(1 for st, _ in rows if st == 429),
+            "pool_p50": _pct(waits, 0.50),
+            "pool_p95": _pct(waits, 0.95),
+        }
+    total = sum(r["rps"] for r in routes.values())
+    return {"counters": counters, "users": len(users), "rps": total, "routes": routes}
+
+
+def _print_step(step: dict) -> None:
+    print(f"\n== {step['counters']} comptoirs ({step['users']} clients) : {step['rps']:.1f} req/s OK")
+    print(f"{'route':<18}{'n':>7}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}"
+          f"{'err':>6}{'429':>6}{'pool p50':>10}{'pool p95':>10}")
+    for name, r in step["routes"].items():
+        print(f"{name:<18}{r['n']:>7}{r['rps']:>8.1f}{r['p50']:>8.1f}{r['p95']:>8.1f}{r['p99']:>8.1f}"
+              f"{r['err']:>6}{r['r429']:>6}{r['pool_p50']:>10.2f}{r['pool_p95']:>10.2f}")
+
+
+def run(args) -> None:
+    _load_url()
+    ctx = _context(args)
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)],
+        cwd=ROOT,
+    )
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    sys.exit("Le serveur n'a pas démarré")
+                time.sleep(0.1)
+
+        steps = []
+        for i, counters in enumerate(int(s) for s in args.steps.split(",")):
+            step = run_step(port, ctx, counters, args.step_seconds, args.seed + i)
+            _print_step(step)
+            steps.append(step)
+    finally:
+        server.terminate()
+        server.wait()
+
+    # Saturation : le débit ne progresse plus (< +5 %) ou le comptoir dépasse le SLO
+    best = max(steps, key=lambda s: s["rps"])
+    saturated = None
+    for prev, cur in zip(steps, steps[1:]):
+        lookup = cur["routes"].get("lookup", {})
+        if cur["rps"] < prev["rps"] * 1.05 or lookup.get("p95", 0) > args.slo_ms:
+            saturated = prev
+            break
+
+    print("\n== Résumé")
+    print(f"débit max observé : {best['rps']:.1f} req/s à {best['counters']} comptoirs")
+    if saturated:
+        print(f"saturation vers {saturated['counters']} comptoirs ({saturated['rps']:.1f} req/s) : "
+              f"au-delà, le débit stagne ou le p95 comptoir dépasse {args.slo_ms:.0f} ms")
+    else:
+        print("pas de saturation atteinte : ajouter des paliers")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(steps, f, indent=2)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Test de charge pharmacie")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_seed = sub.add_parser("seed", help="(re)créer et remplir la base de test")
+    p_seed.add_argument("--products", type=int, default=2000)
+    p_seed.add_argument("--days", type=int, default=365)
+    p_seed.add_argument("--per-day", type=int, default=200, help="mouvements par jour")
+    p_seed.add_argument("--seed", type=int, default=42)
+    p_seed.add_argument("--force", action="store_true", help="autoriser une base non locale")
+
+    p_run = sub.add_parser("run", help="monter la charge par paliers")
+    p_run.add_argument("--steps", default="2,4,8,16,32", help="nb de comptoirs par palier")
+    p_run.add_argument("--step-seconds", type=float, default=20)
+    p_run.add_argument("--think", type=float, default=0.5, help="pause moyenne d'un comptoir (s)")
+    p_run.add_argument("--dashboard-period", type=float, default=5, help="rafraîchissement (s)")
+    p_run.add_argument("--slo-ms", type=float, default=500, help="p95 max d'un scan comptoir")
+    p_run.add_argument("--seed", type=int, default=1)
+    p_run.add_argument("--json", help="écrire les résultats bruts dans ce fichier")
+
+    p_serve = sub.add_parser("serve", help=argparse.SUPPRESS)
+    p_serve.add_argument("--port", type=int, required=True)
+
+    args = parser.parse_args(argv)
+    {"seed": seed, "run": run, "serve": serve}[args.cmd](args)
+
+
+if __name__ == "__main__":
+    main()
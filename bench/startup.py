@@ -0,0 +1,81 @@
+"""
+Benchmark : temps jusqu'à la première réponse (démarrage à froid).
+
+Lance uvicorn dans un sous-processus, interroge /healthz jusqu'à la
+première réponse 200, puis (optionnel) une route qui touche la base.
+
+    DATABASE_URL=... python bench/startup.py --runs 5 [--db-path /api/dashboard/classes]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ok(url: str, timeout: float) -> float:
+    """Attend une réponse 200 ; renvoie l'instant (perf_counter) obtenu."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def one_run(db_path, timeout: float) -> tuple[float, Optional[float]]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    try:
+        t_health = wait_ok(f"{base}/healthz", timeout) - t0
+        t_db = None
+        if db_path:
+            t_db = wait_ok(base + db_path, timeout) - t0
+        return t_health, t_db
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db-path", default=None, help="route DB à mesurer après /healthz")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    health, dbs = [], []
+    for _ in range(args.runs):
+        h, d = one_run(args.db_path, args.timeout)
+        health.append(h * 1000)
+        if d is not None:
+            dbs.append(d * 1000)
+
+    print(f"/healthz        : médiane {statistics.median(health):8.1f} ms  max {max(health):8.1f} ms")
+    if dbs:
+        print(f"{args.db_path:<15} : médiane {statistics.median(dbs):8.1f} ms  max {max(dbs):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,70 @@
 import os
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = os.environ["DATABASE_URL"]  # obligatoire en prod
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    connect_args={"ssl": {"ssl_mode": "REQUIRED"}},
-)
+# L'engine n'est plus créé à l'import : il est créé au démarrage de l'app
+# (lifespan dans main.py) ou au premier get_engine() dans les scripts.
+_engine = None
+_engine_lock = threading.Lock()
 
 
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
-    bind=engine,
 )
 
+def get_engine():
+    """
+    Retourne l'engine, en le créant au premier appel
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                DATABASE_URL = os.environ["DATABASE_URL"]  # obligatoire en prod
+                _engine = create_engine(
+                    DATABASE_URL,
+                    pool_pre_ping=True,
+                    connect_args={"ssl": {"ssl_mode": "REQUIRED"}},
+                )
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+def dispose_engine():
+    """
+    Ferme les connexions du pool (arrêt de l'app)
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+def prewarm_pool(n: int):
+    """
+    Ouvre n connexions d'avance puis les rend au pool, pour que les
+    premières requêtes ne paient pas le handshake TCP/TLS
+    """
+    engine = get_engine()
+    # au-delà de pool_size, les connexions rendues seraient refermées
+    n = min(n, engine.pool.size())
+    conns = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            conns.append(conn)
+    finally:
+        for conn in conns:
+            conn.close()
+
 def get_db():
     """
     Fournit une session DB à FastAPI
     """
+    # lie SessionLocal même hors lifespan (TestClient sans `with`, scripts)
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -1,8 +1,36 @@
+from contextlib import asynccontextmanager
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-app = FastAPI(title="Pharmacie API")
+from db import get_engine, dispose_engine, prewarm_pool
+from admission import AdmissionMiddleware, metrics as admission_metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # engine créé au démarrage (pas à l'import), fermé à l'arrêt
+    get_engine()
+
+    # pré-chauffage optionnel du pool, en tâche de fond :
+    # /healthz répond sans attendre la base
+    prewarm = int(os.getenv("DB_POOL_PREWARM", "0"))
+    if prewarm > 0:
+        threading.Thread(target=prewarm_pool, args=(prewarm,), daemon=True).start()
+
+    yield
+
+    dispose_engine()
+
+
+app = FastAPI(title="Pharmacie API", lifespan=lifespan)
+
+# Contrôle d'admission (429 + Retry-After sous rafale).
+# Ajouté avant CORS pour que CORS reste la couche externe : les 429
+# gardent leurs en-têtes CORS et restent lisibles par le frontend.
+app.add_middleware(AdmissionMiddleware)
 
 # Autoriser les origines (Render / dev / prod)
 origins_env = os.getenv("CORS_ORIGINS", "")
@@ -18,9 +46,22 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Sync-Token", "Retry-After"],
 )
 
 
+# Health check léger : ne touche pas la base
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"ok": True}
+
+
+# Files d'attente / refus du contrôle d'admission
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return admission_metrics()
+
+
 # 🔌 on branche les routes
 from routes.insert_prod import router as insert_prod
 app.include_router(insert_prod)
@@ -41,4 +82,4 @@ from routes.insert_move import router as insert_move
 app.include_router(insert_move)
 
 from routes.edit_movement import router as edit_move
-app.include_router(edit_move)
\ No newline at end of file
+app.include_router(edit_move)
@@ -0,0 +1,216 @@
+"""
+Agrégats journaliers (mouvement_jour) maintenus de façon incrémentale.
+
+Chaque écriture retire / ajoute la contribution des mouvements touchés,
+dans la transaction de la route appelante (pas de commit ici).
+Tout vient de tb_dashboard (classe et prix figés du mouvement), comme
+le reste de /kpis et le mode mémoire d'analytics.py : mêmes règles
+partout, un mouvement absent de tb_dashboard n'est compté nulle part.
+
+Une clé dont la contribution est retirée (jour corrigé…) reste avec nb = 0 :
+les lectures filtrent sur SUM(nb) > 0.
+
+Suppose que tb_dashboard est écrit par triggers (INSERT et UPDATE sur
+`0_mouvement_stock`) dans la même transaction, cf. sql/004. En cas de
+doute ou de dérive, recalculer depuis tb_dashboard + archive :
+
+    python rollup.py check --from 2025-01-01 [--to 2025-03-31]
+    python rollup.py rebuild --from 2025-01-01 [--to 2025-03-31]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+TABLE = "mouvement_jour"
+
+# Agrégats recalculés depuis la source (chaude + archive), jours [:d0, :d1)
+_FROM_SOURCE = """
+    SELECT
+      d.date_mvt AS jour, d.code_produit, COALESCE(d.classe, '') AS classe,
+      d.type_mouvement, COALESCE(d.mouvement, '') AS mouvement,
+      COUNT(*) AS nb,
+      SUM(COALESCE(d.quantite, 0)) AS quantite,
+      SUM(COALESCE(d.quantite, 0) * COALESCE(d.prix_vente, 0)) AS total_ventes,
+      SUM(COALESCE(d.quantite, 0) * COALESCE(d.prix_achat, 0)) AS total_achats
+    FROM (
+      SELECT * FROM tb_dashboard WHERE date_mvt >= :d0 AND date_mvt < :d1
+      UNION ALL
+      SELECT * FROM tb_dashboard_archive WHERE date_mvt >= :d0 AND date_mvt < :d1
+    ) d
+    GROUP BY d.date_mvt, d.code_produit, COALESCE(d.classe, ''),
+             d.type_mouvement, COALESCE(d.mouvement, '')
+"""
+
+# Contribution signée d'un ensemble de mouvements, regroupée par clé du rollup
+_APPLY = f"""
+    INSERT INTO {TABLE}
+      (jour, code_produit, classe, type_mouvement, mouvement,
+       nb, quantite, total_ventes, total_achats)
+    SELECT
+      d.date_mvt, d.code_produit, COALESCE(d.classe, ''), d.type_mouvement,
+      COALESCE(d.mouvement, ''),
+      :sign * COUNT(*),
+      :sign * SUM(COALESCE(d.quantite, 0)),
+      :sign * SUM(COALESCE(d.quantite, 0) * COALESCE(d.prix_vente, 0)),
+      :sign * SUM(COALESCE(d.quantite, 0) * COALESCE(d.prix_achat, 0))
+    FROM tb_dashboard d
+    WHERE {{where}}
+    GROUP BY d.date_mvt, d.code_produit, COALESCE(d.classe, ''),
+             d.type_mouvement, COALESCE(d.mouvement, '')
+    ON DUPLICATE KEY UPDATE
+      {TABLE}.nb = {TABLE}.nb + VALUES(nb),
+      {TABLE}.quantite = {TABLE}.quantite + VALUES(quantite),
+      {TABLE}.total_ventes = {TABLE}.total_ventes + VALUES(total_ventes),
+      {TABLE}.total_achats = {TABLE}.total_achats + VALUES(total_achats)
+"""
+
+
+def add_movements(db: Session, ids: List[int]) -> None:
+    """Ajoute les mouvements (état actuel) au rollup."""
+    if not ids:
+        return
+    sql = text(_APPLY.format(where="d.id_mvt_source IN :ids")).bindparams(bindparam("ids", expanding=True))
+    db.execute(sql, {"sign": 1, "ids": ids})
+
+
+def lock_movements(db: Session, where: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Verrouille (FOR UPDATE) les mouvements filtrés par `where` (alias m)
+    et renvoie leur état avant modification (ligne tb_dashboard), au
+    format du rollup.
+    Verrou exclusif d'emblée : deux PUT concurrents sur la même ligne
+    s'attendent au lieu de finir en deadlock, et le second voit la
+    nouvelle version (=> conflit de version, pas d'erreur 500).
+    """
+    rows = db.execute(text(f"""
+        SELECT
+          m.id,
+          d.id_mvt_source,
+          d.date_mvt AS jour,
+          d.code_produit,
+          COALESCE(d.classe, '') AS classe,
+          d.type_mouvement,
+          COALESCE(d.mouvement, '') AS mouvement,
+          COALESCE(d.quantite, 0) AS quantite,
+          COALESCE(d.prix_vente, 0) AS prix_vente,
+          COALESCE(d.prix_achat, 0) AS prix_achat
+        FROM `0_mouvement_stock` m
+        LEFT JOIN tb_dashboard d ON d.id_mvt_source = m.id
+        WHERE {where}
+        FOR UPDATE OF m
+    """), params).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def remove_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Retire du rollup l'état lu par lock_movements (valeurs d'avant modif)."""
+    # sans ligne tb_dashboard, le mouvement n'a jamais été compté
+    rows = [r for r in rows if r["id_mvt_source"] is not None]
+    if not rows:
+        return
+    keys = ("jour", "code_produit", "classe", "type_mouvement", "mouvement")
+    agg: Dict[tuple, Dict[str, Any]] = defaultdict(
+        lambda: {"nb": 0, "quantite": 0, "total_ventes": 0, "total_achats": 0}
+    )
+    for r in rows:
+        a = agg[tuple(r[k] for k in keys)]
+        a["nb"] -= 1
+        a["quantite"] -= r["quantite"]
+        a["total_ventes"] -= r["quantite"] * r["prix_vente"]
+        a["total_achats"] -= r["quantite"] * r["prix_achat"]
+
+    db.execute(text(f"""
+        INSERT INTO {TABLE}
+          (jour, code_produit, classe, type_mouvement, mouvement,
+           nb, quantite, total_ventes, total_achats)
+        VALUES
+          (:jour, :code_produit, :classe, :type_mouvement, :mouvement,
+           :nb, :quantite, :total_ventes, :total_achats)
+        ON DUPLICATE KEY UPDATE
+          nb = nb + VALUES(nb),
+          quantite = quantite + VALUES(quantite),
+          total_ventes = total_ventes + VALUES(total_ventes),
+          total_achats = total_achats + VALUES(total_achats)
+    """), [dict(zip(keys, k), **v) for k, v in agg.items()])
+
+
+
+# ---------- Contrôle / reconstruction ----------
+
+def check(engine, d0: date, d1: date) -> int:
+    """Jours de [d0, d1) dont le rollup diffère de la source ; renvoie leur nombre."""
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT jour,
+                   SUM(src_nb) AS src_nb, SUM(r_nb) AS r_nb,
+                   SUM(src_v) AS src_v, SUM(r_v) AS r_v,
+                   SUM(src_a) AS src_a, SUM(r_a) AS r_a
+            FROM (
+              SELECT s.jour, s.nb AS src_nb, 0 AS r_nb,
+                     s.total_ventes AS src_v, 0 AS r_v,
+                     s.total_achats AS src_a, 0 AS r_a
+              FROM ({_FROM_SOURCE}) s
+              UNION ALL
+              SELECT r.jour, 0, r.nb, 0, r.total_ventes, 0, r.total_achats
+              FROM {TABLE} r
+              WHERE r.jour >= :d0 AND r.jour < :d1
+            ) x
+            GROUP BY jour
+            HAVING src_nb <> r_nb OR src_v <> r_v OR src_a <> r_a
+            ORDER BY jour
+        """), {"d0": d0, "d1": d1}).mappings().all()
+    for r in rows:
+        print(f"{r['jour']}  nb {r['r_nb']} (source {r['src_nb']})  "
+              f"ventes {r['r_v']} ({r['src_v']})  achats {r['r_a']} ({r['src_a']})")
+    print(f"{len(rows)} jour(s) en écart entre {d0} et {d1 - timedelta(days=1)}")
+    return len(rows)
+
+
+def rebuild(engine, d0: date, d1: date) -> None:
+    """
+    Recalcule [d0, d1) en une transaction. Les écritures concurrentes sur
+    ces jours attendent la fin ; un deadlock (1213) annule tout : relancer,
+    de préférence hors heures d'ouverture.
+    """
+    with engine.begin() as conn:
+        n_del = conn.execute(text(f"""
+            DELETE FROM {TABLE} WHERE jour >= :d0 AND jour < :d1
+        """), {"d0": d0, "d1": d1}).rowcount
+        n_ins = conn.execute(text(f"""
+            INSERT INTO {TABLE}
+              (jour, code_produit, classe, type_mouvement, mouvement,
+               nb, quantite, total_ventes, total_achats)
+            {_FROM_SOURCE}
+        """), {"d0": d0, "d1": d1}).rowcount
+    print(f"{TABLE} : {n_del} lignes supprimées, {n_ins} recalculées")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Agrégats journaliers (mouvement_jour)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name, help_ in (("check", "comparer au recalcul depuis tb_dashboard + archive"),
+                        ("rebuild", "recalculer depuis tb_dashboard + archive")):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True,
+                       help="premier jour (YYYY-MM-DD)")
+        p.add_argument("--to", dest="date_to", type=date.fromisoformat, default=date.today(),
+                       help="dernier jour inclus (défaut: aujourd'hui)")
+
+    args = parser.parse_args(argv)
+    d0, d1 = args.date_from, args.date_to + timedelta(days=1)
+
+    from db import get_engine
+
+    engine = get_engine()
+    if args.cmd == "check":
+        check(engine, d0, d1)
+    else:
+        rebuild(engine, d0, d1)
+
+
+if __name__ == "__main__":
+    main()
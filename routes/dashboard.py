@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from db import get_db, engine
+from db import get_db
+from archive import month_bounds, dashboard_source, month_agg_source
+import analytics
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
@@ -26,24 +28,29 @@ def get_kpis(
     # Tolérance: si le frontend envoie ALL, on le traite comme "Tout"
     classe_norm = "Tout" if (classe or "").strip().upper() == "ALL" else (classe or "Tout").strip()
 
+    if analytics.enabled():
+        return _kpis_memory(db, annee, mois, classe, classe_norm)
+
+    # Bornes du mois (filtre sargable) + sources chaude / archive
+    d0, d1 = month_bounds(annee, mois)
+    params = {"d0": d0, "d1": d1, "classe": classe_norm}
+    agg = month_agg_source(db, d0)
+    src = dashboard_source(db, d0)
+
     # Debug 0: vérifier qu'on a bien des lignes sur la période (sans filtre classe)
-    sql_rows_period = text("""
-        SELECT COUNT(*) AS n
-        FROM tb_dashboard d
-        WHERE YEAR(d.date_mvt) = :annee
-          AND MONTH(d.date_mvt) = :mois
+    sql_rows_period = text(f"""
+        SELECT COALESCE(SUM(a.nb), 0) AS n
+        FROM {agg} a
     """)
-    rows_period = int(db.execute(sql_rows_period, {"annee": annee, "mois": mois}).scalar() or 0)
+    rows_period = int(db.execute(sql_rows_period, params).scalar() or 0)
 
     # 1) Nombre de produits ayant au moins un mouvement dans la période
-    sql_nb = text("""
-        SELECT COUNT(DISTINCT d.code_produit) AS nb
-        FROM tb_dashboard d
-        WHERE YEAR(d.date_mvt) = :annee
-          AND MONTH(d.date_mvt) = :mois
-          AND (:classe = 'Tout' OR d.classe = :classe)
+    sql_nb = text(f"""
+        SELECT COUNT(DISTINCT a.code_produit) AS nb
+        FROM {agg} a
+        WHERE (:classe = 'Tout' OR a.classe = :classe)
     """)
-    nb_produits = int(db.execute(sql_nb, {"annee": annee, "mois": mois, "classe": classe_norm}).scalar() or 0)
+    nb_produits = int(db.execute(sql_nb, params).scalar() or 0)
 
     # 2) denom = produits Actif présents
     sql_denom = text("""
@@ -55,50 +62,52 @@ def get_kpis(
     denom = int(db.execute(sql_denom, {"classe": classe_norm}).scalar() or 0)
 
     # 2) num = stock_apres > 0 après dernier mouvement du mois
-    sql_num = text("""
+    # (ROW_NUMBER plutôt qu'une auto-jointure : une seule lecture de la source)
+    sql_num = text(f"""
         WITH last_mvt AS (
-            SELECT d.code_produit, MAX(d.id_mvt_source) AS last_id
-            FROM tb_dashboard d
-            WHERE YEAR(d.date_mvt) = :annee
-              AND MONTH(d.date_mvt) = :mois
+            SELECT
+              d.code_produit,
+              d.stock_apres,
+              ROW_NUMBER() OVER (PARTITION BY d.code_produit ORDER BY d.id_mvt_source DESC) AS rn
+            FROM {src} d
+            WHERE d.date_mvt >= :d0 AND d.date_mvt < :d1
               AND (:classe = 'Tout' OR d.classe = :classe)
-            GROUP BY d.code_produit
         )
         SELECT COUNT(*) AS num
         FROM last_mvt lm
-        JOIN tb_dashboard d ON d.id_mvt_source = lm.last_id
         JOIN `0_products` p ON p.code = lm.code_produit
-        WHERE p.statut = 'Actif'
+        WHERE lm.rn = 1
+          AND p.statut = 'Actif'
           AND (:classe = 'Tout' OR p.classe = :classe)
-          AND COALESCE(d.stock_apres, 0) > 0
+          AND COALESCE(lm.stock_apres, 0) > 0
     """)
-    num = int(db.execute(sql_num, {"annee": annee, "mois": mois, "classe": classe_norm}).scalar() or 0)
+    num = int(db.execute(sql_num, params).scalar() or 0)
 
     taux_disponibilite = 0.0 if denom == 0 else (num / denom) * 100.0
 
-    # 3) bénéfice net
+    # 3) bénéfice net (agrégats journaliers mouvement_jour, cf. rollup.py ;
+    # classe du mouvement, comme nb_produits / num et le mode mémoire)
     sql_profit = text("""
         SELECT
           COALESCE(SUM(
             CASE
-              WHEN d.type_mouvement = 'sortie' AND d.mouvement = 'vente'
-              THEN COALESCE(d.quantite,0) * COALESCE(d.prix_vente,0)
+              WHEN r.type_mouvement = 'sortie' AND r.mouvement = 'vente'
+              THEN r.total_ventes
               ELSE 0
             END
           ), 0) AS total_ventes,
           COALESCE(SUM(
             CASE
-              WHEN d.type_mouvement = 'entree' AND d.mouvement = 'achat'
-              THEN COALESCE(d.quantite,0) * COALESCE(d.prix_achat,0)
+              WHEN r.type_mouvement = 'entree' AND r.mouvement = 'achat'
+              THEN r.total_achats
               ELSE 0
             END
           ), 0) AS total_achats
-        FROM tb_dashboard d
-        WHERE YEAR(d.date_mvt) = :annee
-          AND MONTH(d.date_mvt) = :mois
-          AND (:classe = 'Tout' OR d.classe = :classe)
+        FROM mouvement_jour r
+        WHERE r.jour >= :d0 AND r.jour < :d1
+          AND (:classe = 'Tout' OR r.classe = :classe)
     """)
-    row = db.execute(sql_profit, {"annee": annee, "mois": mois, "classe": classe_norm}).mappings().first() or {}
+    row = db.execute(sql_profit, params).mappings().first() or {}
     total_ventes = float(row.get("total_ventes", 0) or 0)
     total_achats = float(row.get("total_achats", 0) or 0)
 
@@ -121,6 +130,30 @@ def get_kpis(
         }
     }
 
+def _kpis_memory(db: Session, annee: int, mois: int, classe: str, classe_norm: str):
+    """Même réponse que get_kpis, calculée sur la frame NumPy du mois."""
+    k = analytics.get_frame(db, annee, mois).kpis(classe_norm)
+    num, denom = k["num"], k["denom"]
+    taux_disponibilite = 0.0 if denom == 0 else (num / denom) * 100.0
+    benefice_net = k["total_ventes"] - k["total_achats"]
+
+    return {
+        "nb_produits": k["nb_produits"],
+        "taux_disponibilite": round(taux_disponibilite, 2),
+        "benefice_net": round(benefice_net, 2),
+        "debug": {
+            "annee": annee,
+            "mois": mois,
+            "classe_recue": classe,
+            "classe_norm": classe_norm,
+            "rows_period": k["rows_period"],
+            "dispo_num": num,
+            "dispo_denom": denom,
+            "total_ventes": round(k["total_ventes"], 2),
+            "total_achats": round(k["total_achats"], 2),
+        }
+    }
+
 def norm_classe(classe: str) -> str:
     c = (classe or "").strip()
     return "Tout" if c.upper() == "ALL" or c == "" else c
@@ -165,25 +198,27 @@ def movement_hist(
     db: Session = Depends(get_db),
 ):
     classe_norm = norm_classe(classe)
+    d0, d1 = month_bounds(annee, mois)
 
+    # agrégats journaliers (≤ 31 lignes par produit), archive comprise
     sql = text("""
         SELECT
-            d.mouvement AS mouvement,
-            d.type_mouvement AS type_mouvement,
-            COUNT(*) AS nb
-        FROM tb_dashboard d
-        JOIN `0_products` p ON p.code = d.code_produit
-        WHERE YEAR(d.date_mvt) = :annee
-          AND MONTH(d.date_mvt) = :mois
+            r.mouvement AS mouvement,
+            r.type_mouvement AS type_mouvement,
+            SUM(r.nb) AS nb
+        FROM mouvement_jour r
+        JOIN `0_products` p ON p.code = r.code_produit
+        WHERE r.jour >= :d0 AND r.jour < :d1
           AND p.statut = 'Actif'
           AND (:classe = 'Tout' OR p.classe = :classe)
-          AND d.mouvement IS NOT NULL AND d.mouvement <> ''
-          AND d.type_mouvement IN ('entree','sortie')
-        GROUP BY d.mouvement, d.type_mouvement
-        ORDER BY d.mouvement, d.type_mouvement
+          AND r.mouvement <> ''
+          AND r.type_mouvement IN ('entree','sortie')
+        GROUP BY r.mouvement, r.type_mouvement
+        HAVING SUM(r.nb) > 0
+        ORDER BY r.mouvement, r.type_mouvement
     """)
 
-    rows = db.execute(sql, {"annee": annee, "mois": mois, "classe": classe_norm}).mappings().all()
+    rows = db.execute(sql, {"d0": d0, "d1": d1, "classe": classe_norm}).mappings().all()
 
     # Format simple pour le front:
     # items: [{mouvement:'achat', type:'entree', value: 12}, ...]
@@ -199,7 +234,8 @@ def movement_hist(
     return {"items": items}
 
 # Requête pour avoir le tableau synthétique
-SQL_TABLEAU_MENSUEL = text("""
+# {agg} = source agrégée du mois (table chaude ou mouvement_jour, cf. archive.py)
+SQL_TABLEAU_MENSUEL = """
 WITH params AS (
   SELECT
     CONCAT(:annee, '-', LPAD(:mois,2,'0')) AS ym,
@@ -241,20 +277,18 @@ LEFT JOIN etat_stock_mensuel prev
 
 LEFT JOIN (
   SELECT
-    d.code_produit,
-    SUM(CASE WHEN d.type_mouvement='entree' THEN d.quantite ELSE 0 END) AS qte_entree,
-    SUM(CASE WHEN d.type_mouvement='sortie' THEN d.quantite ELSE 0 END) AS qte_sortie
-  FROM tb_dashboard d
-  WHERE YEAR(d.date_mvt) = :annee
-    AND MONTH(d.date_mvt) = :mois
-  GROUP BY d.code_produit
+    a.code_produit,
+    SUM(CASE WHEN a.type_mouvement='entree' THEN a.quantite ELSE 0 END) AS qte_entree,
+    SUM(CASE WHEN a.type_mouvement='sortie' THEN a.quantite ELSE 0 END) AS qte_sortie
+  FROM {agg} a
+  GROUP BY a.code_produit
 ) mv
   ON mv.code_produit = cur.code_prod
 
 WHERE (:classe = 'Tout' OR p.classe = :classe)
 
 ORDER BY produit ASC;
-""")
+"""
 
 
 @router.get("/tableau_mensuel")
@@ -266,9 +300,17 @@ def tableau_mensuel(
 ):
     classe_norm = norm_classe(classe)  # même logique que les autres endpoints :contentReference[oaicite:4]{index=4}
 
-    rows = db.execute(SQL_TABLEAU_MENSUEL, {
+    if analytics.enabled():
+        return {"data": analytics.get_frame(db, annee, mois).tableau(classe_norm)}
+
+    d0, d1 = month_bounds(annee, mois)
+    sql = text(SQL_TABLEAU_MENSUEL.format(agg=month_agg_source(db, d0)))
+
+    rows = db.execute(sql, {
         "annee": annee,
         "mois": mois,
+        "d0": d0,
+        "d1": d1,
         "classe": classe_norm,
     }).mappings().all()
 
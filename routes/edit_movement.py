@@ -1,13 +1,17 @@
 # backend/routers/movements_edit.py
+import secrets
 from datetime import date, datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.orm import Session
 
+from archive import ARCHIVE_MVT, needs_archive
 from db import get_db
+import analytics
+import rollup
 
 router = APIRouter(prefix="/api/movements", tags=["mouvements"])
 
@@ -18,6 +22,12 @@ TABLE = "`0_mouvement_stock`"  # adapte si besoin
 ALLOWED_TYPE = {"entree", "sortie"}
 ALLOWED_MVT = {"achat", "vente", "perte", "peremption", "don", "ajustement"}
 
+# Colonnes modifiables via PUT /edit (ordre du SET)
+EDITABLE = ("date_mvt", "quantite", "type_mvt", "mouvement", "commentaire")
+
+# Les versions restent < 2^53 pour passer sans perte dans un nombre JS
+VERSION_MAX = 2**53 - 1
+
 
 # ---------- Schémas Pydantic ----------
 
@@ -30,15 +40,18 @@ class MovementOut(BaseModel):
     mouvement: str
     quantite: float
     commentaire: Optional[str] = None
+    version: int  # à renvoyer tel quel dans le patch (ETag)
+    archive: bool = False  # mois archivé : lecture seule (PUT => 409)
 
 
 class MovementPatch(BaseModel):
     """
     Patch partiel (comme ton edit_products) :
-    - id obligatoire
+    - id + version (lue via GET /edit) obligatoires
     - les autres champs sont optionnels (seulement ceux modifiés)
     """
     id: int
+    version: int
 
     # Champs modifiables uniquement
     date_mvt: Optional[date] = None
@@ -48,8 +61,18 @@ class MovementPatch(BaseModel):
     commentaire: Optional[str] = None
 
 
+class MovementConflict(BaseModel):
+    id: int
+    reason: Literal["version", "introuvable"]
+    current_version: Optional[int] = None
+
+
 class BulkUpdateResult(BaseModel):
     updated: int
+    # id -> nouvelle version (pour enchaîner une autre correction)
+    versions: Dict[int, int] = {}
+    # patches refusés : ligne modifiée entre-temps ou inexistante
+    conflicts: List[MovementConflict] = []
 
 
 # ---------- Helpers ----------
@@ -72,6 +95,11 @@ def _validate_patch(p: MovementPatch):
         raise HTTPException(status_code=400, detail=f"mouvement invalide: {p.mouvement}")
 
 
+def _patch_fields(p: MovementPatch) -> Dict[str, Any]:
+    """Champs réellement modifiés par le patch."""
+    return {col: getattr(p, col) for col in EDITABLE if getattr(p, col) is not None}
+
+
 # ---------- Routes ----------
 
 @router.get("/edit", response_model=List[MovementOut])
@@ -86,13 +114,23 @@ def list_movements_for_edit(
     """
     start_dt, end_dt = _day_to_range(day)
 
-    q = text(f"""
-    SELECT id, date_mvt, code_prod, type_mvt, mouvement, quantite, commentaire
-    FROM {TABLE}
-    WHERE code_prod = :code_prod
-      AND date_mvt = :day
-    ORDER BY id ASC
-    """)
+    cols = "id, date_mvt, code_prod, type_mvt, mouvement, quantite, commentaire, version"
+    where = "WHERE code_prod = :code_prod AND date_mvt = :day"
+    if needs_archive(db, day):
+        # mois archivé : les lignes sont dans l'archive (+ saisies après coup)
+        q = text(f"""
+        SELECT {cols}, FALSE AS archive FROM {TABLE} {where}
+        UNION ALL
+        SELECT {cols}, TRUE AS archive FROM {ARCHIVE_MVT} {where}
+        ORDER BY id ASC
+        """)
+    else:
+        q = text(f"""
+        SELECT {cols}, FALSE AS archive
+        FROM {TABLE}
+        {where}
+        ORDER BY id ASC
+        """)
     rows = db.execute(q, {"code_prod": code_prod, "day": day}).mappings().all()
     return [dict(r) for r in rows]
 
@@ -103,12 +141,18 @@ def bulk_update_movements(
     db: Session = Depends(get_db),
 ):
     """
-    Met à jour en lot (bulk) comme /api/products/edit_products :
+    Met à jour en lot (bulk) comme /api/products/edit_products, avec
+    contrôle de version optimiste (pas de verrou) :
     Body: [
-      { "id": 12, "quantite": 5, "commentaire": "..." },
-      { "id": 13, "date_mvt": "2026-01-05T10:20", "type_mvt": "sortie" }
+      { "id": 12, "version": 0, "quantite": 5, "commentaire": "..." },
+      { "id": 13, "version": 0, "date_mvt": "2026-01-05", "type_mvt": "sortie" }
     ]
-    Retour: { updated: N }
+    Retour: { updated: N, versions: {id: nouvelle_version}, conflicts: [...] }
+
+    Un seul UPDATE pour tout le lot : chaque ligne n'est modifiée que si sa
+    version est toujours celle envoyée. Les autres sont renvoyées dans
+    conflicts (à relire puis rejouer côté client).
+    Un mouvement d'un mois archivé refuse tout le lot (409).
     """
     if not patches:
         return {"updated": 0}
@@ -117,58 +161,94 @@ def bulk_update_movements(
     for p in patches:
         _validate_patch(p)
 
-    updated = 0
+    ids = [p.id for p in patches]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="id en double dans le lot")
+
+    # les mois archivés sont en lecture seule (agrégats et partitions figés)
+    archived = db.execute(
+        text(f"SELECT id FROM {ARCHIVE_MVT} WHERE id IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    ).scalars().all()
+    if archived:
+        raise HTTPException(
+            status_code=409,
+            detail=f"mois archivé, mouvements non modifiables: {sorted(archived)}",
+        )
+
+    # Si aucun champ modifié (patch vide), on ignore
+    active = [(p, f) for p in patches if (f := _patch_fields(p))]
+    if not active:
+        return {"updated": 0}
+
+    # construire un UPDATE unique : SET col = CASE id WHEN ... END
+    params: Dict[str, Any] = {}
+    cases: Dict[str, List[str]] = {col: [] for col in EDITABLE}
+    guards = []
+    for i, (p, fields) in enumerate(active):
+        params[f"id_{i}"] = p.id
+        params[f"v_{i}"] = p.version
+        guards.append(f"(:id_{i}, :v_{i})")
+        for col, val in fields.items():
+            params[f"{col}_{i}"] = val
+            cases[col].append(f"WHEN :id_{i} THEN :{col}_{i}")
+
+    sets = [
+        f"{col} = CASE id {' '.join(whens)} ELSE {col} END"
+        for col, whens in cases.items() if whens
+    ]
+    # nouvelle version aléatoire commune au lot : permet de savoir ensuite
+    # exactement quelles lignes ont été modifiées par CETTE requête
+    new_version = secrets.randbelow(VERSION_MAX) + 1
+    sets.append("version = :new_version")
+    params["new_version"] = new_version
+
+    upd = text(f"""
+        UPDATE {TABLE}
+        SET {", ".join(sets)}
+        WHERE (id, version) IN ({", ".join(guards)})
+    """)
+    check = text(f"""
+        SELECT id, version
+        FROM {TABLE}
+        WHERE id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
 
     # On fait une transaction unique : tout passe ou on rollback
     try:
-        for p in patches:
-            # construire SET dynamiquement (uniquement champs présents)
-            sets = []
-            params: Dict[str, Any] = {"id": p.id}
-
-            if p.date_mvt is not None:
-                sets.append("date_mvt = :date_mvt")
-                params["date_mvt"] = p.date_mvt
-
-            if p.quantite is not None:
-                sets.append("quantite = :quantite")
-                params["quantite"] = p.quantite
-
-            if p.type_mvt is not None:
-                sets.append("type_mvt = :type_mvt")
-                params["type_mvt"] = p.type_mvt
-
-            if p.mouvement is not None:
-                sets.append("mouvement = :mouvement")
-                params["mouvement"] = p.mouvement
-
-            if p.commentaire is not None:
-                sets.append("commentaire = :commentaire")
-                params["commentaire"] = p.commentaire
-
-            # Si aucun champ modifié (patch vide), on ignore
-            if not sets:
-                continue
-
-            upd = text(f"""
-                UPDATE {TABLE}
-                SET {", ".join(sets)}
-                WHERE id = :id
-            """)
-
-            res = db.execute(upd, params)
-            # res.rowcount = nb lignes touchées (0 si id inexistant)
-            if res.rowcount == 0:
-                raise HTTPException(status_code=404, detail=f"Mouvement introuvable (id={p.id})")
-
-            updated += res.rowcount
-
+        # agrégats journaliers : on verrouille les lignes qui passent le
+        # contrôle de version, on retire leur état avant modif, puis on
+        # ajoute leur nouvel état (gère le déplacement entre jours si
+        # date_mvt change)
+        old_rows = rollup.lock_movements(db, f"(m.id, m.version) IN ({', '.join(guards)})", params)
+        rollup.remove_rows(db, old_rows)
+        db.execute(upd, params)
+        current = {
+            r["id"]: r["version"]
+            for r in db.execute(check, {"ids": [p.id for p, _ in active]}).mappings()
+        }
+        done = [i for i, v in current.items() if v == new_version]
+        rollup.add_movements(db, done)
+        if done:
+            # pas de nouvel id : on signale l'édition aux caches des workers
+            analytics.bump_version(db)
         db.commit()
-        return {"updated": updated}
-
-    except HTTPException:
-        db.rollback()
-        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+    analytics.invalidate()
+
+    versions: Dict[int, int] = {}
+    conflicts: List[Dict[str, Any]] = []
+    for p, _ in active:
+        v = current.get(p.id)
+        if v == new_version:
+            versions[p.id] = new_version
+        elif v is None:
+            conflicts.append({"id": p.id, "reason": "introuvable"})
+        else:
+            conflicts.append({"id": p.id, "reason": "version", "current_version": v})
+
+    return {"updated": len(versions), "versions": versions, "conflicts": conflicts}
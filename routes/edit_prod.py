@@ -1,31 +1,58 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 
 from db import get_db
+from sync import SYNC_HEADER, parse_since, issue_token
+import analytics
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
 TABLE = "`0_products`"
+FULL_LIMIT = 500  # chargement complet plafonné (écran d'édition)
 
 
 # =========================
 # GET – liste produits
 # =========================
 @router.get("/edit_products")
-def get_products(db: Session = Depends(get_db)):
-    query = text(f"""
-        SELECT code, produit, unite, prix_achat, prix_vente, statut
-        FROM {TABLE}
-        ORDER BY code
-        LIMIT 500
-    """)
-
-    result = db.execute(query)
+def get_products(
+    response: Response,
+    since: Optional[str] = Query(None, description="Jeton X-Sync-Token d'un appel précédent"),
+    db: Session = Depends(get_db),
+):
+    since_dt = parse_since(since)
+    issue_token(db, response)
+
+    if since_dt is None:
+        query = text(f"""
+            SELECT code, produit, unite, prix_achat, prix_vente, statut
+            FROM {TABLE}
+            ORDER BY code
+            LIMIT :limit
+        """)
+    else:
+        # delta : pas de LIMIT, sinon des modifs seraient perdues
+        # alors que le jeton avance quand même
+        query = text(f"""
+            SELECT code, produit, unite, prix_achat, prix_vente, statut
+            FROM {TABLE}
+            WHERE updated_at >= :since
+            ORDER BY code
+        """)
+
+    # une ligne de plus que le plafond pour savoir si la liste est tronquée
+    result = db.execute(query, {"since": since_dt, "limit": FULL_LIMIT + 1})
     rows = result.mappings().all()   # dictionnaires propres
 
+    if since_dt is None and len(rows) > FULL_LIMIT:
+        # liste incomplète : pas de jeton, sinon les produits au-delà du
+        # plafond ne seraient jamais envoyés par les deltas suivants
+        rows = rows[:FULL_LIMIT]
+        del response.headers[SYNC_HEADER]
+
     return rows
 
 
@@ -81,5 +108,6 @@ def update_products(
         updated += result.rowcount
 
     db.commit()
+    analytics.invalidate()
 
     return {"updated": updated}
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from db import get_db
 from fastapi import Depends
+from archive import dashboard_source
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
@@ -28,11 +29,14 @@ def get_movements(
     sort_by = sort_by if sort_by in ALLOWED_SORT else "date_mvt"
     sort_dir = "asc" if str(sort_dir).lower() == "asc" else "desc"
 
+    # archive ajoutée seulement si la période remonte avant l'horizon
+    src = dashboard_source(db, date_from)
+
     sql = f"""
       SELECT
         date_mvt, nom_produit, forme, dosage, classe, cible, unite, prix_achat,
         prix_vente, type_mouvement, mouvement, quantite, stock_apres, commentaire
-      FROM tb_dashboard
+      FROM {src} d
       WHERE date_mvt BETWEEN :date_from AND :date_to
         AND (:q IS NULL OR nom_produit LIKE CONCAT('%', :q, '%'))
         AND (:classe IS NULL OR classe = :classe)
@@ -65,11 +69,13 @@ def get_movement_filters(
     date_to: str = Query(...),
     db: Session = Depends(get_db),
 ):
-    # uniquement tb_dashboard
+    # uniquement tb_dashboard (+ archive si la période le demande)
+    src = dashboard_source(db, date_from)
+
     classes = db.execute(
-        text("""
+        text(f"""
           SELECT DISTINCT classe
-          FROM tb_dashboard
+          FROM {src} d
           WHERE date_mvt BETWEEN :date_from AND :date_to
             AND classe IS NOT NULL AND classe <> ''
           ORDER BY classe
@@ -78,9 +84,9 @@ def get_movement_filters(
     ).scalars().all()
 
     cibles = db.execute(
-        text("""
+        text(f"""
           SELECT DISTINCT cible
-          FROM tb_dashboard
+          FROM {src} d
           WHERE date_mvt BETWEEN :date_from AND :date_to
             AND cible IS NOT NULL AND cible <> ''
           ORDER BY cible
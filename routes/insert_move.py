@@ -7,6 +7,8 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from db import get_db
+import analytics
+import rollup
 
 router = APIRouter(prefix="/api", tags=["mouvements"])
 
@@ -62,7 +64,11 @@ def create_mouvement(payload: MouvementCreate, db: Session = Depends(get_db)):
         INSERT INTO `0_mouvement_stock` (date_mvt, code_prod, type_mvt, mouvement, quantite, commentaire)
         VALUES (:date_mvt, :code_prod, :type_mvt, :mouvement, :quantite, :commentaire)
     """)
-    db.execute(ins, payload.model_dump())
+    res = db.execute(ins, payload.model_dump())
+
+    # 3) agrégats journaliers, dans la même transaction
+    rollup.add_movements(db, [res.lastrowid])
     db.commit()
+    analytics.invalidate()
 
     return {"ok": True}
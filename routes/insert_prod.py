@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import  text
-from db import get_db, engine
+from db import get_db, get_engine
+import analytics
 from pydantic import BaseModel, Field
 from sqlalchemy.exc import IntegrityError
 
@@ -38,7 +39,7 @@ def create_product(p: ProductIn, db: Session = Depends(get_db)):
     """)
 
     try:
-        with engine.begin() as conn:
+        with get_engine().begin() as conn:
             conn.execute(sql, {
                 "code": p.code,
                 "produit": p.produit,
@@ -53,6 +54,7 @@ def create_product(p: ProductIn, db: Session = Depends(get_db)):
                 "date_creation": p.date_creation,
                 "statut": p.statut,
             })
+        analytics.invalidate()
         return {"message": "✅ Produit enregistré."}
 
     except IntegrityError as e:
@@ -1,19 +1,32 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from db import get_db
+from sync import parse_since, issue_token
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 @router.get("/list_products")
-def list_products(db: Session = Depends(get_db)):
+def list_products(
+    response: Response,
+    since: Optional[str] = Query(None, description="Jeton X-Sync-Token d'un appel précédent"),
+    db: Session = Depends(get_db),
+):
+    since_dt = parse_since(since)
+    issue_token(db, response)
+
+    # since absent => catalogue complet ; sinon seulement les lignes
+    # insérées / modifiées / désactivées depuis le jeton
     rows = db.execute(text("""
         SELECT
             code, produit, forme, dosage, classe, cible, unite,
             prix_achat, prix_vente, stock_actuel, date_creation, statut
         FROM `0_products`
+        WHERE (:since IS NULL OR updated_at >= :since)
         ORDER BY produit ASC
-    """)).mappings().all()
+    """), {"since": since_dt}).mappings().all()
 
     return {
         "columns": [
@@ -0,0 +1,10 @@
+-- Suivi des modifications de `0_products` pour la synchro incrémentale (?since=)
+-- updated_at est maintenu par MySQL à chaque INSERT / UPDATE (y compris
+-- le passage en statut 'Inactif'), donc toutes les routes d'écriture le mettent à jour.
+
+ALTER TABLE `0_products`
+  ADD COLUMN updated_at DATETIME(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6)
+    ON UPDATE CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_products_updated_at ON `0_products` (updated_at);
@@ -0,0 +1,42 @@
+-- Archivage des mois clos (voir archive.py)
+--
+-- Les tables *_archive reprennent la structure des tables chaudes (LIKE),
+-- puis sont partitionnées par mois sur date_mvt. Les partitions mensuelles
+-- sont ajoutées au fil de l'eau par `python archive.py run`.
+-- MySQL exige que la clé primaire contienne la colonne de partition :
+-- adapte les DROP/ADD PRIMARY KEY si ta clé diffère.
+--
+-- ⚠️ Vérifier qu'aucun trigger DELETE sur `0_mouvement_stock` ne recrédite
+-- le stock : l'archivage supprime les lignes de la table chaude.
+
+CREATE TABLE IF NOT EXISTS `0_mouvement_stock_archive` LIKE `0_mouvement_stock`;
+ALTER TABLE `0_mouvement_stock_archive`
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (id, date_mvt);
+ALTER TABLE `0_mouvement_stock_archive`
+  PARTITION BY RANGE COLUMNS (date_mvt) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+  );
+
+CREATE TABLE IF NOT EXISTS tb_dashboard_archive LIKE tb_dashboard;
+ALTER TABLE tb_dashboard_archive
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (id_mvt_source, date_mvt);
+ALTER TABLE tb_dashboard_archive
+  PARTITION BY RANGE COLUMNS (date_mvt) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+  );
+
+-- Mois archivés (le plus récent = horizon de l'archive)
+CREATE TABLE IF NOT EXISTS archive_mois (
+  mois DATE NOT NULL PRIMARY KEY,          -- 1er jour du mois
+  nb_mouvements INT NOT NULL DEFAULT 0,
+  archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Les agrégats des mois archivés se lisent dans mouvement_jour
+-- (sql/004), qui garde tout l'historique.
+
+-- Index utiles côté table chaude (filtres par plage de dates)
+CREATE INDEX idx_tb_dashboard_date ON tb_dashboard (date_mvt);
+CREATE INDEX idx_mouvement_stock_date ON `0_mouvement_stock` (date_mvt);
@@ -0,0 +1,11 @@
+-- Version de ligne (ETag) pour l'édition concurrente de `0_mouvement_stock`
+-- Chaque PUT /api/movements/edit pose une nouvelle valeur aléatoire :
+-- le client renvoie la version lue, la mise à jour ne passe que si elle
+-- n'a pas changé entre-temps (pas de verrou, pas d'écrasement silencieux).
+
+ALTER TABLE `0_mouvement_stock`
+  ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0;
+
+-- l'archive reprend la même structure (INSERT ... SELECT *)
+ALTER TABLE `0_mouvement_stock_archive`
+  ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0;
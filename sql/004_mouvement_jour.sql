@@ -0,0 +1,47 @@
+-- Agrégats journaliers des mouvements (voir rollup.py)
+-- Tenus à jour dans la même transaction que POST /api/mouvements et
+-- PUT /api/movements/edit (y compris le déplacement entre jours quand
+-- date_mvt est corrigée). Un histogramme mensuel lit au plus ~31 lignes
+-- par produit au lieu de tous les mouvements.
+-- classe et prix sont ceux figés dans tb_dashboard (comme /kpis).
+--
+-- ⚠️ Prérequis : tb_dashboard doit être écrit par des triggers AFTER INSERT
+-- et AFTER UPDATE sur `0_mouvement_stock` (même transaction que la route),
+-- car rollup.py relit tb_dashboard juste après l'écriture. Sans eux, les
+-- nouvelles ventes ne comptent pas et une date_mvt corrigée ne déplace
+-- rien. Vérifier avec :
+--   SHOW TRIGGERS WHERE `Table` = '0_mouvement_stock';
+-- En cas de dérive : python rollup.py check / rebuild --from ... --to ...
+
+CREATE TABLE IF NOT EXISTS mouvement_jour (
+  jour DATE NOT NULL,
+  code_produit VARCHAR(50) NOT NULL,
+  classe VARCHAR(150) NOT NULL DEFAULT '',
+  type_mouvement VARCHAR(20) NOT NULL,
+  mouvement VARCHAR(50) NOT NULL,
+  nb INT NOT NULL DEFAULT 0,
+  quantite DECIMAL(16,2) NOT NULL DEFAULT 0,
+  total_ventes DECIMAL(18,2) NOT NULL DEFAULT 0,  -- SUM(quantite * prix_vente)
+  total_achats DECIMAL(18,2) NOT NULL DEFAULT 0,  -- SUM(quantite * prix_achat)
+  PRIMARY KEY (jour, code_produit, classe, type_mouvement, mouvement),
+  KEY idx_mouvement_jour_prod (code_produit, jour)
+);
+
+-- Reprise de l'historique (table chaude + archive)
+INSERT INTO mouvement_jour
+  (jour, code_produit, classe, type_mouvement, mouvement,
+   nb, quantite, total_ventes, total_achats)
+SELECT
+  d.date_mvt, d.code_produit, COALESCE(d.classe, ''), d.type_mouvement,
+  COALESCE(d.mouvement, ''),
+  COUNT(*),
+  SUM(COALESCE(d.quantite, 0)),
+  SUM(COALESCE(d.quantite, 0) * COALESCE(d.prix_vente, 0)),
+  SUM(COALESCE(d.quantite, 0) * COALESCE(d.prix_achat, 0))
+FROM (
+  SELECT * FROM tb_dashboard
+  UNION ALL
+  SELECT * FROM tb_dashboard_archive
+) d
+GROUP BY d.date_mvt, d.code_produit, COALESCE(d.classe, ''),
+         d.type_mouvement, COALESCE(d.mouvement, '');
@@ -0,0 +1,13 @@
+-- Compteur d'écritures lu par le cache d'analytics.py (mode mémoire)
+-- Les insertions se voient déjà via MAX(id) des mouvements et
+-- MAX(updated_at) des produits ; ce compteur couvre le reste : édition de
+-- mouvements (PUT /api/movements/edit) et archivage (archive.py).
+-- Chaque worker compare la clé à chaque requête : une écriture faite par
+-- un autre worker invalide aussi ses frames.
+
+CREATE TABLE IF NOT EXISTS data_version (
+  id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+  n BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO data_version (id, n) VALUES (1, 0);
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Header renvoyé par les listes synchronisables (exposé via CORS dans main.py)
+SYNC_HEADER = "X-Sync-Token"
+
+# Marge de recouvrement en plus du jeton (arrondi à la seconde de
+# trx_started, petits écarts d'horloge). Ce n'est pas elle qui protège des
+# transactions longues, cf. issue_token. Le client fait un upsert par code,
+# donc renvoyer quelques lignes en double est sans risque.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def parse_since(since: Optional[str]) -> Optional[datetime]:
+    """
+    Décode le jeton ?since= (horodatage ISO renvoyé par un appel précédent).
+    None => chargement complet.
+    """
+    if since is None or since.strip() == "":
+        return None
+    try:
+        return datetime.fromisoformat(since.strip()) - SYNC_OVERLAP
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Jeton since invalide: {since}")
+
+
+def issue_token(db: Session, response: Response) -> str:
+    """
+    Prend l'heure DB *avant* la lecture des lignes et la renvoie au client
+    dans le header X-Sync-Token : ce sera son prochain ?since=.
+
+    updated_at vaut l'heure de l'UPDATE, pas du commit : une transaction
+    encore ouverte (ex: PUT /edit_products sur beaucoup de lignes) peut
+    commiter plus tard des lignes datées d'avant NOW(). Le jeton recule donc
+    au début de la plus vieille transaction InnoDB en cours ; toute ligne
+    pas encore visible a un updated_at >= ce début.
+    (lecture de innodb_trx : privilège PROCESS requis pour l'utilisateur DB)
+    """
+    now = db.execute(text("""
+        SELECT LEAST(NOW(6), COALESCE(MIN(trx_started), NOW(6)))
+        FROM information_schema.innodb_trx
+    """)).scalar()
+    token = now.isoformat()
+    response.headers[SYNC_HEADER] = token
+    return token